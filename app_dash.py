@@ -1,18 +1,38 @@
 import dash
+import json
+from flask import Response, abort, request, stream_with_context
 from dash import dcc, html, Input, Output, dash_table, State
 import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 import numpy as np
 from datetime import datetime, timedelta
 from dash_utilities import *
+from dash_utilities import _loan_terms
+from schedule_cache import cached_generate_variants, canonical_parameters, variants_cache
+from result_store import MemoryResultStore, result_store, result_key
+from artifact_sink import artifact_sink
+from goal_seek import goal_seek
+from refinancing import simulate_refinancing
+from sensitivity import grid_axis, sensitivity_grid
+from tranches import canonical_tranches, generate_tranches
+from background_jobs import background_manager, job_slot, job_workers
+from scenario_api import DETAILS as SCENARIO_DETAILS, ARITHMETIC, MAX_SOLLZINSBINDUNG, NON_NEGATIVE
+from scenario_api import AMOUNTS, MAX_AMOUNT, MAX_RATE, RATES
+from scenario_api import list_blocks, ndjson_blocks, scenario_lines
+from callback_metrics import callback_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
 import io
+import os
 import base64
+from urllib.parse import quote
 import pandas as pd
 
 # Initialize the Dash app first
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, background_callback_manager=background_manager)
 server = app.server  # Now app is defined before we use it
 
+# upper bound of the paths field, a run is a few seconds per 100,000 paths
+MAX_SIMULATION_PATHS = 200000
+
 # Translation dictionary with additional plot-related translations
 translations = {
     'en': {
@@ -46,6 +66,37 @@ translations = {
         'download_button': 'Download Amortization Schedule',
         'period': 'Period',
         'year': 'Year',
+        'month': 'Month',
+        'goal_seek': 'Goal Seek',
+        'solve_for': 'Solve For',
+        'goal_target': 'Target',
+        'target_payoff_years': 'Paid Off Within (Years)',
+        'monthly_budget': 'Monthly Budget (€)',
+        'goal_value': 'Target Value',
+        'solve': 'Solve',
+        'paid_off': 'Paid Off',
+        'goal_unreachable': 'The target cannot be reached.',
+        'goal_invalid': 'This value does not change the chosen target.',
+        'followup_financing': 'Follow-up Financing',
+        'long_term_rate': 'Long-term Rate (%)',
+        'rate_volatility': 'Rate Volatility (%)',
+        'simulation_paths': 'Simulated Paths',
+        'simulate': 'Simulate',
+        'cancel': 'Cancel',
+        'followup_rate': 'Follow-up Rate',
+        'not_repaid': 'Still open 50 years after the fixed period',
+        'simulation_invalid': 'The simulation cannot run with these values.',
+        'sensitivity': 'Sensitivity to Interest and Repayment Rate',
+        'interest_fixed_period': 'Interest During Fixed Period (€)',
+        'residual_debt_fixed_period': 'Remaining Debt After Fixed Period (€)',
+        'payoff_years': 'Years Until Paid Off',
+        'current_loan': 'Current Loan',
+        'tranches': 'Financing Tranches',
+        'tranche_name': 'Name',
+        'amount': 'Amount (€)',
+        'repayment_free': 'Repayment-free Years',
+        'add_tranche': 'Add Tranche',
+        'bank_loan': 'Bank Loan',
     },
 
     'de': {
@@ -79,6 +130,37 @@ translations = {
         'download_button': 'Tilgungsplan Herunterladen',
         'period': 'Zeitraum',
         'year': 'Jahr',
+        'month': 'Monat',
+        'goal_seek': 'Zielwertsuche',
+        'solve_for': 'Gesucht',
+        'goal_target': 'Ziel',
+        'target_payoff_years': 'Abbezahlt in (Jahren)',
+        'monthly_budget': 'Monatliches Budget (€)',
+        'goal_value': 'Zielwert',
+        'solve': 'Lösen',
+        'paid_off': 'Abbezahlt',
+        'goal_unreachable': 'Das Ziel ist nicht erreichbar.',
+        'goal_invalid': 'Dieser Wert beeinflusst das gewählte Ziel nicht.',
+        'followup_financing': 'Anschlussfinanzierung',
+        'long_term_rate': 'Langfristiger Zins (%)',
+        'rate_volatility': 'Zinsvolatilität (%)',
+        'simulation_paths': 'Simulierte Pfade',
+        'simulate': 'Simulieren',
+        'cancel': 'Abbrechen',
+        'followup_rate': 'Anschlusszins',
+        'not_repaid': '50 Jahre nach der Zinsbindung nicht getilgt',
+        'simulation_invalid': 'Mit diesen Werten ist keine Simulation möglich.',
+        'sensitivity': 'Sensitivität gegenüber Sollzins und Tilgungsrate',
+        'interest_fixed_period': 'Zinsen während der Zinsbindung (€)',
+        'residual_debt_fixed_period': 'Restschuld nach der Zinsbindung (€)',
+        'payoff_years': 'Jahre bis zur Tilgung',
+        'current_loan': 'Aktueller Kredit',
+        'tranches': 'Finanzierungsbausteine',
+        'tranche_name': 'Name',
+        'amount': 'Betrag (€)',
+        'repayment_free': 'Tilgungsfreie Jahre',
+        'add_tranche': 'Baustein hinzufügen',
+        'bank_loan': 'Bankdarlehen',
     },
 
     'zh': {
@@ -111,6 +193,37 @@ translations = {
         'download_button': '下载还款计划表',
         'period': '期间',
         'year': '年',
+        'month': '月份',
+        'goal_seek': '目标求解',
+        'solve_for': '求解项',
+        'goal_target': '目标',
+        'target_payoff_years': '还清年限（年）',
+        'monthly_budget': '每月预算（€）',
+        'goal_value': '目标值',
+        'solve': '求解',
+        'paid_off': '还清',
+        'goal_unreachable': '无法达到该目标。',
+        'goal_invalid': '该参数不影响所选目标。',
+        'followup_financing': '后续融资',
+        'long_term_rate': '长期利率 (%)',
+        'rate_volatility': '利率波动率 (%)',
+        'simulation_paths': '模拟路径数',
+        'simulate': '模拟',
+        'cancel': '取消',
+        'followup_rate': '后续利率',
+        'not_repaid': '固定利率期结束50年后仍未还清',
+        'simulation_invalid': '无法使用这些数值进行模拟。',
+        'sensitivity': '利率与还款率敏感性',
+        'interest_fixed_period': '固定利率期内利息 (€)',
+        'residual_debt_fixed_period': '固定利率期结束时剩余贷款 (€)',
+        'payoff_years': '还清所需年数',
+        'current_loan': '当前贷款',
+        'tranches': '融资组合',
+        'tranche_name': '名称',
+        'amount': '金额 (€)',
+        'repayment_free': '免还本年数',
+        'add_tranche': '添加贷款',
+        'bank_loan': '银行贷款',
     }
 }
 
@@ -118,6 +231,17 @@ translations = {
 app.layout = html.Div([
     dcc.Store(id='translation-store', data='en'),
     dcc.Store(id='calculation-store', data={}),
+    # shipped once with the layout, language switches are done in the browser
+    dcc.Store(id='translations', data={'labels': translations, 'chinese_months': CHINESE_MONTHS}),
+    # language neutral figure and table rows from the server
+    dcc.Store(id='figure-store', data={}),
+    dcc.Store(id='table-store', data={}),
+    # outcome of the last goal seek, rendered in the selected language
+    dcc.Store(id='goal-store', data={}),
+    # percentile bands of the last follow-up financing simulation
+    dcc.Store(id='refinance-store', data={}),
+    # Sollzins x Tilgungsrate grid around the current loan
+    dcc.Store(id='sensitivity-store', data={}),
     
     # Main container
     html.Div([
@@ -207,6 +331,80 @@ app.layout = html.Div([
                         className='calculate-button'
                     ),
                 ], className='inputs-grid'),
+
+                # Further tranches (KfW, Bauspar, ...), the bank loan above
+                # finances whatever they leave open
+                html.Div([
+                    html.H3(id='tranche-label', className='goal-title'),
+                    dash_table.DataTable(
+                        id='tranche-table',
+                        data=[],
+                        editable=True,
+                        row_deletable=True,
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'minWidth': '70px', 'padding': '5px'}
+                    ),
+                    html.Button(id='add-tranche', n_clicks=0, className='calculate-button'),
+                ], className='inputs-grid goal-container'),
+
+                # Goal seek, fills in the solved input
+                html.Div([
+                    html.H3(id='goal-seek-label', className='goal-title'),
+
+                    html.Div([
+                        html.Label(id='goal-variable-label', className='input-label'),
+                        dcc.Dropdown(id='goal-variable', value='repayment-rate', clearable=False),
+                    ], className='input-container'),
+
+                    html.Div([
+                        html.Label(id='goal-target-label', className='input-label'),
+                        dcc.Dropdown(id='goal-target', value='payoff_years', clearable=False),
+                    ], className='input-container'),
+
+                    html.Div([
+                        html.Label(id='goal-value-label', className='input-label'),
+                        dcc.Input(id='goal-value', type='number', value=25, className='input-field'),
+                    ], className='input-container'),
+
+                    html.Button(
+                        id='goal-button',
+                        n_clicks=0,
+                        className='calculate-button'
+                    ),
+                    html.Div(id='goal-message', className='goal-message'),
+                ], className='inputs-grid goal-container'),
+
+                # Monte Carlo of the follow-up financing, runs as a background job
+                html.Div([
+                    html.H3(id='refinance-label', className='goal-title'),
+
+                    html.Div([
+                        html.Label(id='long-term-rate-label', className='input-label'),
+                        dcc.Input(id='long-term-rate', type='number', value=3.5, min=0, step=0.1,
+                                  className='input-field'),
+                    ], className='input-container'),
+
+                    html.Div([
+                        html.Label(id='rate-volatility-label', className='input-label'),
+                        dcc.Input(id='rate-volatility', type='number', value=1, min=0, step=0.1,
+                                  className='input-field'),
+                    ], className='input-container'),
+
+                    html.Div([
+                        html.Label(id='simulation-paths-label', className='input-label'),
+                        dcc.Input(id='simulation-paths', type='number', value=10000, min=100,
+                                  max=MAX_SIMULATION_PATHS, step=100, className='input-field'),
+                    ], className='input-container'),
+
+                    html.Div([
+                        html.Button(id='refinance-button', n_clicks=0, className='calculate-button'),
+                        html.Button(id='refinance-cancel', n_clicks=0, disabled=True,
+                                    className='calculate-button cancel-button'),
+                    ], className='job-buttons'),
+                    html.Progress(id='refinance-progress', value='0', max='1', className='job-progress',
+                                  style={'visibility': 'hidden'}),
+                    html.Div(id='refinance-message', className='goal-message'),
+                ], className='inputs-grid goal-container'),
             ], className='inputs-column'),
             
             # Right column - Plot and Table stacked vertically
@@ -223,7 +421,8 @@ app.layout = html.Div([
                 html.Div([
                     # Download section
                     html.Div([
-                        html.Button(
+                        # links to the /download route, see download_link
+                        html.A(
                             [
                                 html.I(className="fas fa-download"),
                                 html.Span(id='download-button-text')
@@ -231,7 +430,6 @@ app.layout = html.Div([
                             id="btn-download",
                             className='download-button'
                         ),
-                        dcc.Download(id="download-dataframe-csv"),
                     ], className='download-section'),
                     
                     # Table
@@ -247,9 +445,25 @@ app.layout = html.Div([
                             'backgroundColor': 'rgb(230, 230, 230)',
                             'fontWeight': 'bold'
                         },
-                        page_size=20
+                        # paging, sorting and filtering run on the server,
+                        # only the visible page is sent to the browser
+                        page_action='custom',
+                        page_current=0,
+                        page_size=20,
+                        sort_action='custom',
+                        sort_mode='single',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query=''
                     )
-                ], className='table-wrapper')
+                ], className='table-wrapper'),
+
+                # Sensitivity heatmap, one metric at a time
+                html.Div([
+                    html.H3(id='sensitivity-label', className='goal-title'),
+                    dcc.Dropdown(id='sensitivity-metric', value='total_interest', clearable=False),
+                    dcc.Graph(id='sensitivity-plot', className='plot-container'),
+                ], className='heatmap-wrapper'),
             ], className='plot-column'),
             
         ], className='main-content'),
@@ -345,6 +559,13 @@ app.index_string = '''
                 margin-top: 20px;
             }
 
+            .heatmap-wrapper {
+                background-color: white;
+                border-radius: 10px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+                padding: 15px;
+            }
+
             .plot-container {
                 width: 100%;
                 height: 600px;
@@ -414,6 +635,39 @@ app.index_string = '''
                 background-color: #0056b3;
             }
 
+            .goal-container {
+                margin-top: 30px;
+                padding-top: 20px;
+                border-top: 1px solid var(--border-color);
+            }
+
+            .goal-title {
+                font-size: 1.1rem;
+                color: var(--primary-color);
+            }
+
+            .goal-message {
+                font-size: 0.9rem;
+            }
+
+            .job-buttons {
+                display: flex;
+                gap: 10px;
+            }
+
+            .cancel-button {
+                background-color: #6c757d;
+            }
+
+            .calculate-button:disabled {
+                background-color: #adb5bd;
+                cursor: default;
+            }
+
+            .job-progress {
+                width: 100%;
+            }
+
             /* Visualization column (Plot and Table) */
             .visualization-column {
                 display: grid;
@@ -473,6 +727,8 @@ app.index_string = '''
             
             .download-button {
                 display: flex;
+                width: fit-content;
+                text-decoration: none;
                 align-items: center;
                 gap: 8px;
                 padding: 12px 20px;
@@ -514,7 +770,66 @@ app.index_string = '''
 '''
 
 # Callback for updating labels
-@app.callback(
+app.clientside_callback(
+    """
+    function(language, translations) {
+        const t = translations.labels[language];
+        return [
+            t.title,
+            t.language,
+            t.purchase_price,
+            t.equity,
+            t.broker_fee,
+            t.notary_fee,
+            t.real_estate_transfer_tax,
+            t.land_registry,
+            t.extra_payment,
+            t.repayment_rate,
+            t.interest_rate,
+            t.fixed_interest,
+            t.calculate,
+            language,
+            t.download_button,
+            t.goal_seek,
+            t.solve_for,
+            t.goal_target,
+            t.goal_value,
+            t.solve,
+            [
+                {label: t.repayment_rate, value: 'repayment-rate'},
+                {label: t.extra_payment, value: 'extra-payment'},
+                {label: t.purchase_price, value: 'purchase-price'}
+            ],
+            [
+                {label: t.target_payoff_years, value: 'payoff_years'},
+                {label: t.monthly_budget, value: 'budget'}
+            ],
+            t.followup_financing,
+            t.long_term_rate,
+            t.rate_volatility,
+            t.simulation_paths,
+            t.simulate,
+            t.cancel,
+            t.sensitivity,
+            [
+                {label: t.interest_fixed_period, value: 'total_interest'},
+                {label: t.residual_debt_fixed_period, value: 'residual_debt'},
+                {label: t.payoff_years, value: 'payoff_year'}
+            ],
+            t.tranches,
+            t.add_tranche,
+            [
+                {name: t.tranche_name, id: 'name', type: 'text'},
+                {name: t.amount, id: 'amount', type: 'numeric'},
+                {name: t.interest_rate, id: 'interest_rate', type: 'numeric'},
+                {name: t.repayment_rate, id: 'repayment_rate', type: 'numeric'},
+                {name: t.fixed_interest, id: 'fixed_interest', type: 'numeric'},
+                {name: t.repayment_free, id: 'repayment_free', type: 'numeric'},
+                {name: t.extra_payment, id: 'extra_payment', type: 'numeric'}
+            ]
+        ];
+    }
+    """,
     [Output('title', 'children'),
      Output('language-label', 'children'),
      Output('purchase-price-label', 'children'),
@@ -529,28 +844,44 @@ app.index_string = '''
      Output('fixed-interest-label', 'children'),
      Output('calculate-button', 'children'),
      Output('translation-store', 'data'),
-     Output('download-button-text', 'children')],
-    [Input('language-selector', 'value')]
+     Output('download-button-text', 'children'),
+     Output('goal-seek-label', 'children'),
+     Output('goal-variable-label', 'children'),
+     Output('goal-target-label', 'children'),
+     Output('goal-value-label', 'children'),
+     Output('goal-button', 'children'),
+     Output('goal-variable', 'options'),
+     Output('goal-target', 'options'),
+     Output('refinance-label', 'children'),
+     Output('long-term-rate-label', 'children'),
+     Output('rate-volatility-label', 'children'),
+     Output('simulation-paths-label', 'children'),
+     Output('refinance-button', 'children'),
+     Output('refinance-cancel', 'children'),
+     Output('sensitivity-label', 'children'),
+     Output('sensitivity-metric', 'options'),
+     Output('tranche-label', 'children'),
+     Output('add-tranche', 'children'),
+     Output('tranche-table', 'columns')],
+    [Input('language-selector', 'value')],
+    [State('translations', 'data')]
+)
+
+# add_tranche: a new row with typical KfW terms to start from
+app.clientside_callback(
+    """
+    function(n_clicks, rows) {
+        return (rows || []).concat([{
+            name: 'KfW', amount: 100000, interest_rate: 2.5, repayment_rate: 2,
+            fixed_interest: 10, repayment_free: 2, extra_payment: 0
+        }]);
+    }
+    """,
+    Output('tranche-table', 'data'),
+    [Input('add-tranche', 'n_clicks')],
+    [State('tranche-table', 'data')],
+    prevent_initial_call=True
 )
-def update_language(language):
-    translation = translations[language]
-    return (
-        translation['title'],
-        translation['language'],
-        translation['purchase_price'],
-        translation['equity'],
-        translation['broker_fee'],
-        translation['notary_fee'],
-        translation['real_estate_transfer_tax'],
-        translation['land_registry'],
-        translation['extra_payment'],
-        translation['repayment_rate'],
-        translation['interest_rate'],
-        translation['fixed_interest'],
-        translation['calculate'],
-        language,
-        translation['download_button']
-    )
 
 @app.callback(
     Output('calculation-store', 'data'),
@@ -564,46 +895,144 @@ def update_language(language):
      State('extra-payment', 'value'),
      State('repayment-rate', 'value'),
      State('interest-rate', 'value'),
-     State('fixed-interest', 'value')]
+     State('fixed-interest', 'value'),
+     State('tranche-table', 'data')]
 )
 
 ## call another function here.
 def store_calculations(n_clicks, purchase_price, equity, broker_fee,
                       notary_fee, real_estate_transfer_tax, land_registry, extra_payment_rate, 
-                      repayment_rate, interest_rate, fixed_interest):
+                      repayment_rate, interest_rate, fixed_interest, tranche_rows=None):
     if n_clicks == 0:
         return {}
 
 
-    df_with_extra_repayment = generate_graph_df(
-    kaufpreis=purchase_price,
-    Eigenkapital=equity,
-    Tilgungsrate=repayment_rate/100,
-    Sollzins=interest_rate/100,
-    Sollzinsbindung=fixed_interest,
-    Sondertilgung_rate=extra_payment_rate/100,
-    Grunderwerbsteuer_rate=real_estate_transfer_tax/100,
-    Maklerprovison_rate=broker_fee/100,
-    Notarkosten_rate=notary_fee/100,
-    Grundbucheintrag_rate=land_registry/100,
-    Start_Date='2024-12-01'
-    )
-    df_with_extra_repayment.to_csv('with_repayment.csv', index=False)  # Set index=False to exclude the index column
+    try:
+        params = calculation_parameters(
+            purchase_price, equity, broker_fee, notary_fee, real_estate_transfer_tax, land_registry,
+            extra_payment_rate, repayment_rate, interest_rate, fixed_interest, tranche_parameters(tranche_rows)
+        )
+    except ValueError:
+        # a tranche the engine can't take, keep showing the last result
+        return dash.no_update
+    key = result_key(params)
+    if result_store.get(key) is None:
+        result_store.put(key, calculate_result(params))
+
+    # the browser only keeps the key, plus the few parameters needed to
+    # recompute the result on a worker that doesn't have it
+    return {
+        'key': key,
+        'params': params,
+    }
+
 
-    df_without_extra_repayment = generate_graph_df(
+def calculation_parameters(purchase_price, equity, broker_fee, notary_fee, real_estate_transfer_tax,
+                           land_registry, extra_payment_rate, repayment_rate, interest_rate, fixed_interest,
+                           tranches=None):
+    # row 0 with, row 1 without Sondertilgung
+    params = canonical_parameters(
+        variants_cache.parameters,
         kaufpreis=purchase_price,
-    Eigenkapital=equity,
-    Tilgungsrate=repayment_rate/100,
-    Sollzins=interest_rate/100,
-    Sollzinsbindung=fixed_interest,
-    Sondertilgung_rate=0,
-    Grunderwerbsteuer_rate=real_estate_transfer_tax/100,
-    Maklerprovison_rate=broker_fee/100,
-    Notarkosten_rate=notary_fee/100,
-    Grundbucheintrag_rate=land_registry/100,
-    Start_Date='2024-12-01'
+        Eigenkapital=equity,
+        Tilgungsrate=repayment_rate/100,
+        Sollzins=interest_rate/100,
+        Sollzinsbindung=fixed_interest,
+        Sondertilgung_rates=(extra_payment_rate/100, 0),
+        Grunderwerbsteuer_rate=real_estate_transfer_tax/100,
+        Maklerprovison_rate=broker_fee/100,
+        Notarkosten_rate=notary_fee/100,
+        Grundbucheintrag_rate=land_registry/100,
+        Start_Date='2024-12-01'
     )
-    df_without_extra_repayment.to_csv('without_repayment.csv', index=False)  # Set index=False to exclude the index column
+    if tranches:
+        params['tranches'] = canonical_tranches(tranches)
+    check_calculation(params)
+    return params
+
+
+# tranche table column -> tranche parameter and the factor from its unit
+TRANCHE_COLUMNS = {
+    'name': ('name', None),
+    'amount': ('Nettodarlehen', 1),
+    'interest_rate': ('Sollzins', 100),
+    'repayment_rate': ('Tilgungsrate', 100),
+    'fixed_interest': ('Sollzinsbindung', 1),
+    'repayment_free': ('Tilgungsfreie_Jahre', 1),
+    'extra_payment': ('Sondertilgung_rate', 100),
+}
+
+
+def tranche_parameters(rows):
+    # tranche dicts for the complete rows of the tranche table, rows still
+    # being filled in are left out
+    tranches = []
+    for row in rows or []:
+        values = [row.get(column) for column in TRANCHE_COLUMNS if column != 'name']
+        if any(value is None or value == '' for value in values):
+            continue
+        tranche = {}
+        for column, (name, unit) in TRANCHE_COLUMNS.items():
+            value = row.get(column)
+            tranche[name] = value if unit is None else float(value) / unit
+        tranches.append(tranche)
+    return tranches
+
+
+def canonical_calculation(params):
+    # calculation parameters as sent back by the browser, normalized
+    params = dict(params)
+    tranches = params.pop('tranches', None)
+    canonical = canonical_parameters(variants_cache.parameters, **params)
+    if tranches:
+        canonical['tranches'] = canonical_tranches(tranches)
+    check_calculation(canonical)
+    return canonical
+
+
+def check_calculation(params):
+    # Raises ValueError for parameters outside the limits of scenario_api.
+    # Callers get parameters from the browser or a URL, so nothing is
+    # computed before this passed.
+    check_loan(params)
+    if not 1 <= params['Sollzinsbindung'] <= MAX_SOLLZINSBINDUNG:
+        raise ValueError(f'Sollzinsbindung must be a whole number of years from 1 to {MAX_SOLLZINSBINDUNG}')
+
+
+def check_loan(params):
+    # check_calculation without the Sollzinsbindung, for goal seek which
+    # runs until the loan is repaid
+    values = {name: params[name] for name in BATCH_PARAMETERS if name not in ('Sollzinsbindung', 'Sondertilgung_rate')}
+    values['Sondertilgung_rate'] = min(params['Sondertilgung_rates'], default=0.0)
+    if not all(np.isfinite(value) for value in values.values()):
+        raise ValueError('parameters must be finite numbers')
+    if values['kaufpreis'] <= 0:
+        raise ValueError('kaufpreis must be positive')
+    for name in NON_NEGATIVE:
+        if values[name] < 0:
+            raise ValueError(f'{name} must not be negative')
+    for name in AMOUNTS:
+        if values[name] > MAX_AMOUNT:
+            raise ValueError(f'{name} must not exceed {MAX_AMOUNT:,.0f}')
+    values['Sondertilgung_rate'] = max(params['Sondertilgung_rates'], default=0.0)
+    for name in RATES:
+        if values[name] > MAX_RATE:
+            raise ValueError(f'{name} must not exceed {MAX_RATE:g}')
+    fees = (values['Grunderwerbsteuer_rate'] + values['Maklerprovison_rate'] + values['Notarkosten_rate']
+            + values['Grundbucheintrag_rate'])
+    if values['kaufpreis'] * (1 + fees) <= values['Eigenkapital']:
+        raise ValueError('Eigenkapital covers the whole purchase')
+
+
+def calculate_result(params):
+    if params.get('tranches'):
+        return calculate_tranche_result(params)
+
+    # both scenarios in one pass
+    variants = cached_generate_variants(**params)
+    if artifact_sink.enabled:
+        artifact_sink.submit('with_repayment', variant_df(variants, 0))
+        artifact_sink.submit('without_repayment', variant_df(variants, 1))
     
     scenarios_data={}
 
@@ -619,26 +1048,18 @@ def store_calculations(n_clicks, purchase_price, equity, broker_fee,
     'Tilgungszahlung_List':'每月还款本金'
     """
 
-    
-    scenarios_data["without_extra_repayment"] = {
-            'remaining_debt': df_without_extra_repayment['aktuelle_Nettodarlehen_List'],
-            'cumulative_interest': df_without_extra_repayment['Zinszahlung_List_Cumu'],
-            'paid_principal': df_without_extra_repayment['totaltilgungszahlung_List'],
-            'monthly_interest': df_without_extra_repayment['Zinszahlung_List'],
-            'monthly_principal': df_without_extra_repayment['Tilgungszahlung_List']
-        }
-    
-
-    scenarios_data["with_extra_repayment"] = {
-            'remaining_debt': df_with_extra_repayment['aktuelle_Nettodarlehen_List'],
-            'cumulative_interest': df_with_extra_repayment['Zinszahlung_List_Cumu'],
-            'paid_principal': df_with_extra_repayment['totaltilgungszahlung_List'],
-            'monthly_interest': df_with_extra_repayment['Zinszahlung_List'],
-            'monthly_principal': df_with_extra_repayment['Tilgungszahlung_List']
+    for scenario_type, index in [("without_extra_repayment", 1), ("with_extra_repayment", 0)]:
+        scenarios_data[scenario_type] = {
+            'remaining_debt': variants['aktuelle_Nettodarlehen_List'][index],
+            'cumulative_interest': variants['Zinszahlung_List_Cumu'][index],
+            'paid_principal': variants['totaltilgungszahlung_List'][index],
+            'monthly_interest': variants['Zinszahlung_List'][index],
+            'monthly_principal': variants['Tilgungszahlung_List'][index]
         }
     
-    months=df_with_extra_repayment['Date']
-    years =df_with_extra_repayment['Years_List']
+    # datetime64[M] month axis, labels are only made where they are shown
+    months=variants['months']
+    years =variants['Years_List']
 
     return {
         'months': months,
@@ -646,86 +1067,503 @@ def store_calculations(n_clicks, purchase_price, equity, broker_fee,
         'scenarios': scenarios_data,
     }
 
-# Modified callback for updating the plot
+
+def calculate_tranche_result(params):
+    # The bank loan from the inputs finances what the tranches leave open.
+    # Every tranche is computed with and without its Sondertilgung in one
+    # pass; scenarios hold the sums, tranches the parts with Sondertilgung.
+    Nettodarlehen = _loan_terms(
+        params['kaufpreis'], params['Eigenkapital'], params['Tilgungsrate'], params['Sollzins'], 0,
+        params['Grunderwerbsteuer_rate'], params['Maklerprovison_rate'], params['Notarkosten_rate'],
+        params['Grundbucheintrag_rate']
+    )[0]
+    tranches = list(params['tranches'])
+    remainder = Nettodarlehen - sum(tranche['Nettodarlehen'] for tranche in tranches)
+    if remainder > 0:
+        tranches.insert(0, {
+            'name': 'bank_loan',
+            'Nettodarlehen': remainder,
+            'Sollzins': params['Sollzins'],
+            'Tilgungsrate': params['Tilgungsrate'],
+            'Sollzinsbindung': params['Sollzinsbindung'],
+            'Sondertilgung_rate': params['Sondertilgung_rates'][0],
+        })
+    without = [{**tranche, 'name': f"{tranche['name']}/without", 'Sondertilgung_rate': 0.0} for tranche in tranches]
+    schedule = generate_tranches(tranches + without, params['Start_Date'])
+    n = len(tranches)
+
+    def metrics(rows):
+        Zinszahlung = schedule['Zinszahlung_List'][rows].sum(axis=0)
+        Tilgungszahlung = schedule['Tilgungszahlung_List'][rows].sum(axis=0)
+        remaining_debt = schedule['aktuelle_Nettodarlehen_List'][rows].sum(axis=0)
+        return {
+            'remaining_debt': remaining_debt,
+            'cumulative_interest': np.cumsum(Zinszahlung),
+            'paid_principal': schedule['totaltilgungszahlung_List'][rows].sum(axis=0),
+            'monthly_interest': Zinszahlung,
+            'monthly_principal': Tilgungszahlung,
+        }
+
+    return {
+        'months': schedule['months'],
+        'years': schedule['Years_List'],
+        'scenarios': {
+            'without_extra_repayment': metrics(slice(n, 2 * n)),
+            'with_extra_repayment': metrics(slice(0, n)),
+        },
+        'tranches': {schedule['names'][i]: metrics(slice(i, i + 1)) for i in range(n)},
+    }
+
+
+def load_result(data):
+    # fetch the result behind calculation-store from the server side store
+    if not data:
+        return None
+    result = result_store.get(data['key'])
+    if result is None:
+        # computed by another worker or evicted meanwhile. The parameters
+        # come from the browser, so they are only trusted when they hash to
+        # the key the result is stored under.
+        try:
+            params = canonical_calculation(data['params'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if result_key(params) != data['key']:
+            return None
+        result = calculate_result(params)
+        result_store.put(data['key'], result)
+    return result
+
+# input that goal seek solves for and the goal_seek parameter behind it
+GOAL_VARIABLES = {
+    'repayment-rate': 'Tilgungsrate',
+    'extra-payment': 'Sondertilgung_rate',
+    'purchase-price': 'kaufpreis',
+}
+
+
+@app.callback(
+    [Output('purchase-price', 'value'),
+     Output('extra-payment', 'value'),
+     Output('repayment-rate', 'value'),
+     Output('goal-store', 'data')],
+    [Input('goal-button', 'n_clicks')],
+    [State('purchase-price', 'value'),
+     State('equity', 'value'),
+     State('broker-fee', 'value'),
+     State('notary-fee', 'value'),
+     State('real-estate-transfer-tax', 'value'),
+     State('land-registry', 'value'),
+     State('extra-payment', 'value'),
+     State('repayment-rate', 'value'),
+     State('interest-rate', 'value'),
+     State('goal-variable', 'value'),
+     State('goal-target', 'value'),
+     State('goal-value', 'value')]
+)
+def solve_goal(n_clicks, purchase_price, equity, broker_fee, notary_fee, real_estate_transfer_tax, land_registry,
+               extra_payment_rate, repayment_rate, interest_rate, goal_variable, goal_target, goal_value):
+    unchanged = [dash.no_update] * 3
+    if n_clicks == 0 or goal_value is None:
+        return unchanged + [dash.no_update]
+
+    try:
+        params = dict(
+            kaufpreis=purchase_price,
+            Eigenkapital=equity,
+            Tilgungsrate=repayment_rate/100,
+            Sollzins=interest_rate/100,
+            Sondertilgung_rate=extra_payment_rate/100,
+            Grunderwerbsteuer_rate=real_estate_transfer_tax/100,
+            Maklerprovison_rate=broker_fee/100,
+            Notarkosten_rate=notary_fee/100,
+            Grundbucheintrag_rate=land_registry/100,
+        )
+        check_loan({**params, 'Sondertilgung_rates': (params['Sondertilgung_rate'],)})
+        result = goal_seek(GOAL_VARIABLES.get(goal_variable), goal_target, goal_value, **params,
+                           Start_Date='2024-12-01')
+    except (TypeError, ValueError):
+        return unchanged + [{'status': 'invalid'}]
+    if result['value'] is None:
+        return unchanged + [{'status': 'unreachable'}]
+
+    # rates are entered in percent
+    value = result['value'] if goal_variable == 'purchase-price' else round(result['value'] * 100, 2)
+    outputs = [value if name == goal_variable else dash.no_update
+               for name in ('purchase-price', 'extra-payment', 'repayment-rate')]
+    return outputs + [{
+        'status': 'solved',
+        'variable': goal_variable,
+        'value': value,
+        'monthly_payment': result['Fest_Monatsrate'],
+        'payoff_date': result['payoff_date'],
+    }]
+
+
+# translate_goal: the goal seek outcome in the selected language
+app.clientside_callback(
+    """
+    function(goal, language, translations) {
+        if (!goal || !goal.status) {
+            return '';
+        }
+        const t = translations.labels[language];
+        if (goal.status !== 'solved') {
+            return t['goal_' + goal.status];
+        }
+        const labels = {
+            'repayment-rate': t.repayment_rate,
+            'extra-payment': t.extra_payment,
+            'purchase-price': t.purchase_price
+        };
+        const value = goal.variable === 'purchase-price'
+            ? '€' + goal.value.toLocaleString('en-US') : goal.value + ' %';
+        const lines = [
+            labels[goal.variable] + ': ' + value,
+            t.monthly_payment + ': €' + goal.monthly_payment.toLocaleString('en-US')
+        ];
+        if (goal.payoff_date) {
+            const parts = goal.payoff_date.split(' ');
+            const date = language === 'zh'
+                ? parts[1] + ' ' + translations.chinese_months[parts[0]] : goal.payoff_date;
+            lines.push(t.paid_off + ': ' + date);
+        }
+        return lines.join(' · ');
+    }
+    """,
+    Output('goal-message', 'children'),
+    [Input('goal-store', 'data'),
+     Input('language-selector', 'value')],
+    [State('translations', 'data')]
+)
+
 @app.callback(
-    Output('mortgage-plot', 'figure'),
+    Output('refinance-store', 'data'),
+    [Input('refinance-button', 'n_clicks')],
+    [State('purchase-price', 'value'),
+     State('equity', 'value'),
+     State('broker-fee', 'value'),
+     State('notary-fee', 'value'),
+     State('real-estate-transfer-tax', 'value'),
+     State('land-registry', 'value'),
+     State('extra-payment', 'value'),
+     State('repayment-rate', 'value'),
+     State('interest-rate', 'value'),
+     State('fixed-interest', 'value'),
+     State('long-term-rate', 'value'),
+     State('rate-volatility', 'value'),
+     State('simulation-paths', 'value')],
+    background=True,
+    progress=[Output('refinance-progress', 'value'),
+              Output('refinance-progress', 'max')],
+    running=[(Output('refinance-button', 'disabled'), True, False),
+             (Output('refinance-cancel', 'disabled'), False, True),
+             (Output('refinance-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})],
+    cancel=[Input('refinance-cancel', 'n_clicks')],
+    prevent_initial_call=True
+)
+def simulate_followup(set_progress, n_clicks, purchase_price, equity, broker_fee, notary_fee,
+                      real_estate_transfer_tax, land_registry, extra_payment_rate, repayment_rate, interest_rate,
+                      fixed_interest, long_term_rate, rate_volatility, paths):
+    # runs in a job process of background_manager once a job slot is free,
+    # see background_jobs
+    if n_clicks == 0:
+        return dash.no_update
+    # the same inputs and limits as a calculation, the model inputs are
+    # rates too
+    try:
+        params = calculation_parameters(
+            purchase_price, equity, broker_fee, notary_fee, real_estate_transfer_tax, land_registry,
+            extra_payment_rate, repayment_rate, interest_rate, fixed_interest
+        )
+        theta, sigma = long_term_rate/100, rate_volatility/100
+        if not all(np.isfinite(value) and abs(value) <= MAX_RATE for value in (theta, sigma)):
+            raise ValueError('rate model inputs out of range')
+        paths = int(min(max(paths, 100), MAX_SIMULATION_PATHS))
+    except (TypeError, ValueError):
+        return {'status': 'invalid'}
+
+    set_progress(('0', '1'))
+    with job_slot() as keep_slot:
+        def progress(done, total):
+            keep_slot()
+            set_progress((str(done), str(total)))
+
+        try:
+            result = simulate_refinancing(
+                kaufpreis=params['kaufpreis'],
+                Eigenkapital=params['Eigenkapital'],
+                Tilgungsrate=params['Tilgungsrate'],
+                Sollzins=params['Sollzins'],
+                Sollzinsbindung=params['Sollzinsbindung'],
+                Sondertilgung_rate=params['Sondertilgung_rates'][0],
+                Grunderwerbsteuer_rate=params['Grunderwerbsteuer_rate'],
+                Maklerprovison_rate=params['Maklerprovison_rate'],
+                Notarkosten_rate=params['Notarkosten_rate'],
+                Grundbucheintrag_rate=params['Grundbucheintrag_rate'],
+                Start_Date=params['Start_Date'],
+                theta=theta,
+                sigma=sigma,
+                paths=paths,
+                percentiles=(5, 50, 95),
+                workers=job_workers(),
+                progress=progress
+            )
+        except ValueError:
+            return {'status': 'invalid'}
+
+    return {
+        'status': 'done',
+        'residual': result['residual'],
+        'followup_rate': [None if np.isnan(r) else round(r * 100, 2) for r in result['followup_rate'].tolist()],
+        'total_interest': np.rint(result['total_interest']).tolist(),
+        'payoff_date': result['payoff_date'],
+        'not_repaid': result['not_repaid'],
+    }
+
+
+# translate_refinance: 5th percentile, median and 95th percentile of the
+# simulation in the selected language
+app.clientside_callback(
+    """
+    function(simulation, language, translations) {
+        if (!simulation || !simulation.status) {
+            return '';
+        }
+        const t = translations.labels[language];
+        if (simulation.status !== 'done') {
+            return t['simulation_' + simulation.status];
+        }
+        const band = function(values, format) {
+            return format(values[1]) + ' (' + format(values[0]) + ' – ' + format(values[2]) + ')';
+        };
+        const euro = function(value) { return '€' + value.toLocaleString('en-US'); };
+        const date = function(label) {
+            const parts = label.split(' ');
+            return language === 'zh' ? parts[1] + ' ' + translations.chinese_months[parts[0]] : label;
+        };
+        const lines = [
+            t.total_interest + ': ' + band(simulation.total_interest, euro),
+            t.paid_off + ': ' + band(simulation.payoff_date, date)
+        ];
+        if (simulation.residual > 0) {
+            lines.unshift(t.followup_rate + ': ' + band(simulation.followup_rate, function(r) { return r + ' %'; }));
+        }
+        if (simulation.not_repaid > 0) {
+            lines.push(t.not_repaid + ': ' + (simulation.not_repaid * 100).toFixed(1) + ' %');
+        }
+        return lines.join(' · ');
+    }
+    """,
+    Output('refinance-message', 'children'),
+    [Input('refinance-store', 'data'),
+     Input('language-selector', 'value')],
+    [State('translations', 'data')]
+)
+
+# inputs of the calculation the sensitivity grid depends on
+SENSITIVITY_INPUTS = (
+    'kaufpreis', 'Eigenkapital', 'Tilgungsrate', 'Sollzins', 'Sollzinsbindung', 'Grunderwerbsteuer_rate',
+    'Maklerprovison_rate', 'Notarkosten_rate', 'Grundbucheintrag_rate',
+)
+
+# grids are kept by the hash of those inputs, so recalculating a loan, or
+# one that only differs in its tranches or start date, costs nothing
+sensitivity_store = MemoryResultStore(maxsize=128)
+
+
+@app.callback(
+    Output('sensitivity-store', 'data'),
+    [Input('calculation-store', 'data')]
+)
+def update_sensitivity(store_data):
+    # every metric of the grid at once, switching metric or language is
+    # done by translate_sensitivity in the browser
+    if not store_data:
+        return {}
+    try:
+        params = canonical_calculation(store_data['params'])
+    except (KeyError, TypeError, ValueError):
+        return {}
+    inputs = {name: params[name] for name in SENSITIVITY_INPUTS}
+    inputs['Sondertilgung_rate'] = params['Sondertilgung_rates'][0]
+    key = result_key(inputs)
+    data = sensitivity_store.get(key)
+    if data is None:
+        data = sensitivity_data(inputs)
+        sensitivity_store.put(key, data)
+    return data
+
+
+def sensitivity_data(inputs):
+    grid = sensitivity_grid(
+        Sollzins_values=grid_axis(inputs['Sollzins']),
+        Tilgungsrate_values=grid_axis(inputs['Tilgungsrate']),
+        **{name: value for name, value in inputs.items() if name not in ('Sollzins', 'Tilgungsrate')}
+    )
+    # rates in percent, as entered; loans open after MAX_YEARS are null
+    return {
+        'interest_rate': np.round(grid['Sollzins'] * 100, 4).tolist(),
+        'repayment_rate': np.round(grid['Tilgungsrate'] * 100, 4).tolist(),
+        'current': [round(inputs['Tilgungsrate'] * 100, 4), round(inputs['Sollzins'] * 100, 4)],
+        'total_interest': grid['total_interest'].tolist(),
+        'residual_debt': np.rint(grid['residual_debt']).astype(np.int64).tolist(),
+        'payoff_year': [[None if np.isnan(v) else int(v) for v in row] for row in grid['payoff_year'].tolist()],
+    }
+
+
+# translate_sensitivity: heatmap of the selected metric in the selected
+# language
+app.clientside_callback(
+    """
+    function(grid, metric, language, translations) {
+        if (!grid || !grid[metric]) {
+            return {data: [], layout: {}};
+        }
+        const t = translations.labels[language];
+        const titles = {
+            total_interest: t.interest_fixed_period,
+            residual_debt: t.residual_debt_fixed_period,
+            payoff_year: t.payoff_years
+        };
+        return {
+            data: [
+                {
+                    type: 'heatmap',
+                    x: grid.repayment_rate,
+                    y: grid.interest_rate,
+                    z: grid[metric],
+                    colorscale: 'Viridis',
+                    reversescale: true,
+                    hovertemplate: t.repayment_rate + ': %{x} %<br>' + t.interest_rate + ': %{y} %<br>'
+                        + titles[metric] + ': %{z:,}<extra></extra>'
+                },
+                {
+                    type: 'scatter',
+                    mode: 'markers',
+                    x: [grid.current[0]],
+                    y: [grid.current[1]],
+                    name: t.current_loan,
+                    marker: {symbol: 'x', size: 12, color: 'red'},
+                    hovertemplate: t.current_loan + '<extra></extra>'
+                }
+            ],
+            layout: {
+                title: {text: titles[metric]},
+                xaxis: {title: {text: t.repayment_rate + ' (%)'}},
+                yaxis: {title: {text: t.interest_rate + ' (%)'}},
+                showlegend: false
+            }
+        };
+    }
+    """,
+    Output('sensitivity-plot', 'figure'),
+    [Input('sensitivity-store', 'data'),
+     Input('sensitivity-metric', 'value'),
+     Input('language-selector', 'value')],
+    [State('translations', 'data')]
+)
+
+# Modified callback for updating the plot, labels are filled in by
+# translate_figure in the browser
+@app.callback(
+    Output('figure-store', 'data'),
     [Input('calculation-store', 'data'),
-     Input('language-selector', 'value')]
+     Input('mortgage-plot', 'relayoutData')]
 )
-def update_graph(data, language):
+def update_graph(store_data, relayout_data):
+    triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+    x_range = zoomed_range(relayout_data)
+    if triggered == ['mortgage-plot.relayoutData'] and x_range is None and not (
+            relayout_data and 'xaxis.autorange' in relayout_data):
+        # relayout that doesn't touch the x axis, the drawn points stay valid
+        return dash.no_update
+
+    data = load_result(store_data)
     if not data:
         return go.Figure()
-    
-    fig = go.Figure()
-    
-    # Mapping for scenario names
-    scenario_names = {
-        #'with_extra_repayment': translations[language]['with_extra_repayment'],#,
-        'remaining_loan':  translations[language]['remaining_loan'],
-        'cumulative_interest':    translations[language]['cumulative_interest'],
-        'paid_principal':    translations[language]['paid_principal'],
-        'monthly_interest':    translations[language]['monthly_interest'],
-        'monthly_principal':    translations[language]['monthly_principal'],
-        #'without_extra_repayment': translations[language]['without_extra_repayment'],
-        #'high_repayment': translations[language]['high_repayment']
-    }
-    
-    language_map = translations[language]
-
-    # Create hover template
-    hover_template = """
-        <b>%{customdata[4]}</b><br>
-        %{customdata[10]}<br>
-        %{customdata[5]}: %{y}<br>
-        %{customdata[6]}: %{customdata[0]}<br>
-        %{customdata[7]}: %{customdata[1]}<br>
-        %{customdata[8]}: %{customdata[2]}<br>
-        %{customdata[9]}: %{customdata[3]}<br>
+
+    fig = build_figure(data, x_range)
+    # keep the user's zoom across redraws until a new calculation comes in
+    fig.update_layout(uirevision=store_data['key'])
+    return fig
+
+
+# Level of detail for the amortization chart: at most PLOT_MAX_POINTS points
+# per trace, reduced with PLOT_DETAIL ('yearly' or 'lttb'). Zooming in far
+# enough shows every month of the visible range.
+PLOT_DETAIL = 'yearly'
+PLOT_MAX_POINTS = 150
+
+
+def zoomed_range(relayout_data):
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    return None
+
+
+# Static hover labels are looked up from the trace meta, so per point only
+# the numbers in customdata and the month label in text are shipped. The
+# server fills meta and the trace name with translation keys:
+# meta = [scenario, remaining_loan, cumulative_interest, paid_principal,
+#         monthly_interest, monthly_principal]
+HOVER_TEMPLATE = """
+        <b>%{meta[0]}</b><br>
+        %{text}<br>
+        %{meta[1]}: %{y}<br>
+        %{meta[2]}: %{customdata[0]}<br>
+        %{meta[3]}: %{customdata[1]}<br>
+        %{meta[4]}: %{customdata[2]}<br>
+        %{meta[5]}: %{customdata[3]}<br>
         <extra></extra>
     """
 
-    years=data['years']
-    years_month=data['months']
-    if language=="zh":
-        years_month=convert_to_chinese(years_month)
+METRIC_KEYS = ['remaining_loan', 'cumulative_interest', 'paid_principal', 'monthly_interest', 'monthly_principal']
+
+
+def build_figure(data, x_range=None):
+    fig = go.Figure()
+
+    # x positions only need a few decimals, the long float tails of the
+    # accumulated 0.08333 steps would otherwise dominate the payload
+    years=np.round(data['years'], 5)
+    months=np.asarray(data['months'])
     
-    # Add traces for each scenario
+    # Add traces for each scenario, and dashed ones for the tranches of a
+    # financing made of several (with their Sondertilgung)
+    traces = [(name, scenario_data, None) for name, scenario_data in data['scenarios'].items()]
+    traces += [(name, tranche_data, dict(dash='dash')) for name, tranche_data in data.get('tranches', {}).items()]
+    for scenario_type, scenario_data, line in traces:
+        points = detail_indices(
+            years, scenario_data['remaining_debt'], x_range, max_points=PLOT_MAX_POINTS, mode=PLOT_DETAIL
+        )
 
-    for scenario_type, scenario_data in data['scenarios'].items():
-        # Convert months to years for x-axis
-        # Starting point, e.g., January 2024
-        # Convert to "Month Year" format
-        
-        # Prepare custom data for hover
-        custom_data = list(zip(
-            scenario_data['cumulative_interest'],
-            scenario_data['paid_principal'],
-            scenario_data['monthly_interest'],
-            scenario_data['monthly_principal'],
-            [translations[language][scenario_type]] * len(years),  # Scenario name for each point，
-            [scenario_names['remaining_loan']]* len(years),
-            [scenario_names['cumulative_interest']]* len(years),
-            [scenario_names['paid_principal']]* len(years),
-            [scenario_names['monthly_interest']]* len(years),
-            [scenario_names['monthly_principal']]* len(years),
-            years_month
+        # numeric hover values, one row per point
+        custom_data = np.column_stack((
+            scenario_data['cumulative_interest'][points],
+            scenario_data['paid_principal'][points],
+            scenario_data['monthly_interest'][points],
+            scenario_data['monthly_principal'][points],
         ))
 
-        
         fig.add_trace(go.Scatter(
-            x=years,
-            y=scenario_data['remaining_debt'],
-            name=translations[language][scenario_type],
+            x=years[points],
+            y=scenario_data['remaining_debt'][points],
+            name=scenario_type,
             mode='lines+markers',
+            line=line,
             customdata=custom_data,
-            hovertemplate=hover_template
+            text=axis_labels(months[points]),
+            meta=[scenario_type] + METRIC_KEYS,
+            hovertemplate=HOVER_TEMPLATE
         ))
     
-    # Update layout with translated labels
+    # titles are set by translate_figure
     fig.update_layout(
-        title=translations[language]['plot_title'],
-        xaxis_title=translations[language]['loan_duration'],
-        yaxis_title=translations[language]['remaining_debt'],
         legend=dict(
             yanchor="top",
             y=0.99,
@@ -743,81 +1581,356 @@ def update_graph(data, language):
     
     return fig
 
-# Add new callback for the table
+
+# translate_figure: swaps the translation keys in the server figure for the
+# selected language, including the month labels for zh
+app.clientside_callback(
+    """
+    function(figure, language, translations) {
+        if (!figure || !figure.data || !figure.data.length) {
+            return {data: [], layout: {}};
+        }
+        const t = translations.labels[language];
+        const months = translations.chinese_months;
+        const convertMonth = function(label) {
+            if (language !== 'zh' || typeof label !== 'string') {
+                return label;
+            }
+            const parts = label.split(' ');
+            return parts[1] + ' ' + months[parts[0]];
+        };
+        const data = figure.data.map(function(trace) {
+            return Object.assign({}, trace, {
+                // tranche names are the user's own unless translated
+                name: t[trace.name] || trace.name,
+                meta: trace.meta.map(function(key) { return t[key] || key; }),
+                text: trace.text.map(convertMonth)
+            });
+        });
+        const layout = Object.assign({}, figure.layout, {
+            title: {text: t.plot_title},
+            xaxis: Object.assign({}, figure.layout.xaxis, {title: {text: t.loan_duration}}),
+            yaxis: Object.assign({}, figure.layout.yaxis, {title: {text: t.remaining_debt}})
+        });
+        return {data: data, layout: layout};
+    }
+    """,
+    Output('mortgage-plot', 'figure'),
+    [Input('figure-store', 'data'),
+     Input('language-selector', 'value')],
+    [State('translations', 'data')]
+)
+
+# Add new callback for the table, headers and the period label are filled
+# in by translate_table in the browser. The column ids are always sent,
+# also for a page without rows, so the filter row stays and can be cleared.
 @app.callback(
-    Output('mortgage-table', 'data'),
-    Output('mortgage-table', 'columns'),
+    Output('table-store', 'data'),
+    Output('mortgage-table', 'page_count'),
     [Input('calculation-store', 'data'),
-     Input('language-selector', 'value')]
+     Input('mortgage-table', 'page_current'),
+     Input('mortgage-table', 'page_size'),
+     Input('mortgage-table', 'sort_by'),
+     Input('mortgage-table', 'filter_query')]
 )
-def update_table(data, language):
+def update_table(data, page_current, page_size, sort_by, filter_query):
+    data = load_result(data)
     if not data:
-        return [], []
-    
+        return {'rows': [], 'columns': TABLE_COLUMNS}, 0
+
+    columns = table_columns(data)
+    rows = filter_rows(columns, filter_query)
+    if sort_by:
+        order = np.argsort(columns[sort_by[0]['column_id']][rows], kind='stable')
+        if sort_by[0]['direction'] == 'desc':
+            order = order[::-1]
+        rows = rows[order]
+
+    page_count = max(-(-len(rows) // page_size), 1)
+    page_current = min(page_current or 0, page_count - 1)
+    page = rows[page_current * page_size:(page_current + 1) * page_size]
+    return {'rows': format_table_rows(columns, page), 'columns': list(columns)}, page_count
+
+
+# numeric table columns in display order, followed by the monthly payment
+# of each tranche as 'payment:<tranche name>'
+TABLE_COLUMNS = ['year', 'remaining_debt', 'monthly_interest', 'monthly_principal', 'total_payment']
+TRANCHE_PAYMENT = 'payment:'
+
+
+def table_columns(data):
     # Get the first scenario data (with extra repayment)
     scenario_data = data['scenarios']['with_extra_repayment']
-    
-    # Create table data with translated year
-    table_data = []
-    for i, (year, remaining, interest, principal) in enumerate(zip(
-        data['years'],
-        scenario_data['remaining_debt'],
-        scenario_data['monthly_interest'],
-        scenario_data['monthly_principal']
-    )):
-        table_data.append({
-            'year': f'{translations[language]["year"]} {int(year)}',
-            'remaining_debt': f'€{remaining:,.2f}',
-            'monthly_interest': f'€{interest:,.2f}',
-            'monthly_principal': f'€{principal:,.2f}',
-            'total_payment': f'€{(interest + principal):,.2f}'
-        })
-    
-    # Define columns with translations
-    columns = [
-        {'name': translations[language]['period'], 'id': 'year'},
-        {'name': translations[language]['remaining_debt'], 'id': 'remaining_debt'},
-        {'name': translations[language]['monthly_interest'], 'id': 'monthly_interest'},
-        {'name': translations[language]['monthly_principal'], 'id': 'monthly_principal'},
-        {'name': translations[language]['monthly_payment'], 'id': 'total_payment'}
-    ]
-    
-    return table_data, columns
+    columns = {
+        'year': np.asarray(data['years']).astype(np.int64),
+        'remaining_debt': np.asarray(scenario_data['remaining_debt']),
+        'monthly_interest': np.asarray(scenario_data['monthly_interest']),
+        'monthly_principal': np.asarray(scenario_data['monthly_principal']),
+        'total_payment': np.asarray(scenario_data['monthly_interest']) + np.asarray(scenario_data['monthly_principal']),
+    }
+    for name, tranche_data in data.get('tranches', {}).items():
+        columns[TRANCHE_PAYMENT + name] = (
+            np.asarray(tranche_data['monthly_interest']) + np.asarray(tranche_data['monthly_principal'])
+        )
+    return columns
 
-# Update the download callback
-@app.callback(
-    Output("download-dataframe-csv", "data"),
-    Input("btn-download", "n_clicks"),
-    [State('mortgage-table', 'data'),
-     State('language-selector', 'value')],
-    prevent_initial_call=True,
+
+def format_table_rows(columns, rows):
+    # the year stays a number here, translate_table adds the label
+    names = list(columns)
+    formatted = {'year': columns['year'][rows].tolist()}
+    for column in names[1:]:
+        formatted[column] = format_euro(columns[column][rows]).tolist()
+    return [dict(zip(names, values)) for values in zip(*(formatted[c] for c in names))]
+
+
+FILTER_OPERATORS = [
+    ('ge ', '>='),
+    ('le ', '<='),
+    ('lt ', '<'),
+    ('gt ', '>'),
+    ('ne ', '!='),
+    ('eq ', '='),
+    ('contains ',),
+]
+
+
+def split_filter_part(filter_part):
+    # "{remaining_debt} > 100000" -> ('remaining_debt', '>', '100000')
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+                value = value_part.strip()
+                if value and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+                    value = value[1:-1]
+                return name, operator_type[-1].strip(), value
+    return None, None, None
+
+
+def filter_rows(columns, filter_query):
+    # indices of the rows matching the DataTable filter query
+    mask = np.ones(len(columns['year']), dtype=bool)
+    for filter_part in (filter_query or '').split(' && '):
+        name, operator, value = split_filter_part(filter_part)
+        if name not in columns:
+            continue
+        values = columns[name]
+        if operator == 'contains':
+            text = values.astype(str) if name == 'year' else format_euro(values)
+            mask &= np.char.find(text, value) >= 0
+            continue
+        try:
+            number = float(value.replace('€', '').replace(',', ''))
+        except ValueError:
+            continue
+        mask &= {
+            '>=': np.greater_equal,
+            '<=': np.less_equal,
+            '<': np.less,
+            '>': np.greater,
+            '!=': np.not_equal,
+            '=': np.equal,
+        }[operator](values, number)
+    return np.flatnonzero(mask)
+
+
+# translate_table
+app.clientside_callback(
+    """
+    function(table, language, translations) {
+        if (!table || !table.columns) {
+            return [[], []];
+        }
+        const t = translations.labels[language];
+        const data = table.rows.map(function(row) {
+            return Object.assign({}, row, {year: t.year + ' ' + row.year});
+        });
+        const names = {
+            year: t.period,
+            remaining_debt: t.remaining_debt,
+            monthly_interest: t.monthly_interest,
+            monthly_principal: t.monthly_principal,
+            total_payment: t.monthly_payment
+        };
+        const columns = table.columns.map(function(id) {
+            if (id.startsWith('payment:')) {
+                const tranche = id.slice('payment:'.length);
+                return {name: t.monthly_payment + ' ' + (t[tranche] || tranche), id: id};
+            }
+            return {name: names[id], id: id};
+        });
+        return [data, columns];
+    }
+    """,
+    Output('mortgage-table', 'data'),
+    Output('mortgage-table', 'columns'),
+    [Input('table-store', 'data'),
+     Input('language-selector', 'value')],
+    [State('translations', 'data')]
 )
-def download_table(n_clicks, table_data, language):
-    if n_clicks is None:
-        return None
-    
-    # Create DataFrame with translated column names
-    df = pd.DataFrame(table_data)
-    
-    # Rename columns based on language
-    column_translations = {
-        'year': translations[language]['period'],
-        'remaining_debt': translations[language]['remaining_debt'],
-        'monthly_interest': translations[language]['monthly_interest'],
-        'monthly_principal': translations[language]['monthly_principal'],
-        'total_payment': translations[language]['monthly_payment']
+
+# The schedule download is served by a plain Flask route. The file is built
+# from the stored result in chunks while it is sent, never from the table
+# data in the browser. The link carries the canonical parameters so any
+# worker can recompute a result it doesn't hold.
+app.clientside_callback(
+    """
+    function(data, language) {
+        if (!data || !data.key) {
+            return null;
+        }
+        return '/download/' + data.key + '.csv?lang=' + language
+            + '&params=' + encodeURIComponent(JSON.stringify(data.params));
     }
-    
-    df = df.rename(columns=column_translations)
-    
-    # Generate filename based on language
-    filename = {
-        'en': 'mortgage_amortization.csv',
-        'de': 'tilgungsplan.csv',
-        'zh': '还款计划表.csv'
-    }[language]
-    
-    return dcc.send_data_frame(df.to_csv, filename, index=False)
+    """,
+    Output('btn-download', 'href'),
+    [Input('calculation-store', 'data'),
+     Input('language-selector', 'value')]
+)
+
+DOWNLOAD_CHUNK_ROWS = 4096
+
+DOWNLOAD_FILENAMES = {
+    'en': 'mortgage_amortization',
+    'de': 'tilgungsplan',
+    'zh': '还款计划表'
+}
+
+
+def download_columns(data, language):
+    # numeric schedule columns under their translated names; the start row
+    # has no month of its own and the debt is in whole euros like the rest
+    columns = table_columns(data)
+    translation = translations[language]
+    download = {
+        translation['period']: columns['year'],
+        translation['month']: np.concatenate(([''], axis_labels(data['months'][1:], language))),
+        translation['remaining_debt']: np.rint(columns['remaining_debt']).astype(np.int64),
+        translation['monthly_interest']: columns['monthly_interest'],
+        translation['monthly_principal']: columns['monthly_principal'],
+        translation['monthly_payment']: columns['total_payment'],
+    }
+    for name, values in columns.items():
+        if name.startswith(TRANCHE_PAYMENT):
+            tranche = name[len(TRANCHE_PAYMENT):]
+            download[f"{translation['monthly_payment']} {translation.get(tranche, tranche)}"] = values
+    return download
+
+
+def csv_chunks(columns, chunk_rows=DOWNLOAD_CHUNK_ROWS):
+    rows = len(next(iter(columns.values())))
+    for start in range(0, max(rows, 1), chunk_rows):
+        chunk = pd.DataFrame({name: values[start:start + chunk_rows] for name, values in columns.items()})
+        yield chunk.to_csv(index=False, header=start == 0).encode('utf-8')
+
+
+def parquet_file(columns, chunk_rows=DOWNLOAD_CHUNK_ROWS):
+    # Parquet needs its footer before the file can be sent, so row groups are
+    # spooled into a temporary file instead of memory
+    import tempfile
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    spool = tempfile.TemporaryFile()
+    table = pa.table(columns)
+    with pq.ParquetWriter(spool, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+    spool.seek(0)
+    return spool
+
+
+def file_chunks(f, chunk_size=1 << 16):
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+@server.route('/download/<key>.<fmt>')
+def download_table(key, fmt):
+    language = request.args.get('lang', 'en')
+    if fmt not in ('csv', 'parquet') or language not in translations:
+        abort(404)
+
+    try:
+        params = json.loads(request.args.get('params', 'null'))
+    except ValueError:
+        abort(404)
+    data = load_result({'key': key, 'params': params})
+    if data is None:
+        abort(404)
+
+    # a key always describes the same schedule, so the file never changes
+    etag = f'{key}-{language}-{fmt}'
+    headers = {
+        'Cache-Control': 'private, max-age=31536000, immutable',
+        'ETag': f'"{etag}"',
+    }
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+
+    columns = download_columns(data, language)
+    if fmt == 'csv':
+        # sent with chunked transfer encoding as it is rendered, so the file
+        # is neither kept in memory nor rendered twice for its length
+        length = None
+        body = csv_chunks(columns)
+        mimetype = 'text/csv'
+    else:
+        try:
+            spool = parquet_file(columns)
+        except ImportError:
+            # an install without pyarrow
+            abort(501)
+        length = os.fstat(spool.fileno()).st_size
+        body = file_chunks(spool)
+        mimetype = 'application/vnd.apache.parquet'
+
+    filename = f'{DOWNLOAD_FILENAMES[language]}.{fmt}'
+    if length is not None:
+        headers['Content-Length'] = str(length)
+    headers['Content-Disposition'] = f"attachment; filename=download.{fmt}; filename*=UTF-8''{quote(filename)}"
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+# Bulk pricing for partner systems, see scenario_api. Accepts a JSON list of
+# parameter sets (or {"scenarios": [...]}) or NDJSON with one set per line,
+# and streams back one NDJSON line per scenario; ?detail=schedule adds the
+# monthly arrays, ?arithmetic=cents returns integer cents for reconciling
+# against lender statements.
+@server.route('/api/scenarios', methods=['POST'])
+def price_scenarios():
+    detail = request.args.get('detail', 'summary')
+    arithmetic = request.args.get('arithmetic', 'float')
+    if detail not in SCENARIO_DETAILS or arithmetic not in ARITHMETIC:
+        abort(400)
+
+    if request.mimetype == 'application/x-ndjson':
+        blocks = ndjson_blocks(request.stream)
+    else:
+        body = request.get_json(silent=True)
+        scenarios = body.get('scenarios') if isinstance(body, dict) else body
+        if not isinstance(scenarios, list):
+            abort(400)
+        blocks = list_blocks(scenarios)
+    return Response(stream_with_context(scenario_lines(blocks, detail, arithmetic)), mimetype='application/x-ndjson')
+
+
+# time every server-side callback registered above and report the caches
+callback_metrics.instrument(app)
+callback_metrics.register_cache('variants', variants_cache)
+callback_metrics.register_cache('results', result_store)
+callback_metrics.register_cache('sensitivity', sensitivity_store)
+
+
+@server.route('/metrics')
+def metrics():
+    return Response(callback_metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
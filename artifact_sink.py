@@ -0,0 +1,121 @@
+import os
+import queue
+import tempfile
+import threading
+import uuid
+from collections import deque
+
+from schedule_storage import write_table
+
+
+# Where computed schedules go after a calculation. Set MORTGAGE_ARTIFACTS to
+# 'off' (default), 'memory', or a directory for background files, written as
+# MORTGAGE_ARTIFACTS_FORMAT: 'csv' (default), 'arrow' or 'parquet'.
+ARTIFACTS_ENV = 'MORTGAGE_ARTIFACTS'
+ARTIFACTS_FORMAT_ENV = 'MORTGAGE_ARTIFACTS_FORMAT'
+
+SUFFIXES = {'csv': '.csv', 'arrow': '.arrow', 'parquet': '.parquet'}
+
+
+class NullSink:
+    enabled = False
+
+    def submit(self, name, df):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemorySink:
+    # keeps the most recent artifacts of this process, mostly for debugging
+    enabled = True
+
+    def __init__(self, maxlen=32):
+        self.artifacts = deque(maxlen=maxlen)
+
+    def submit(self, name, df):
+        self.artifacts.append((name, df))
+
+    def close(self):
+        pass
+
+
+def arrow_frame(df):
+    # Arrow needs one type per column: the start row of a schedule has the
+    # integer 0 instead of a date string, stored as null like
+    # schedule_storage.result_table does
+    if 'Date' not in df.columns or df['Date'].dtype != object or len(df) == 0:
+        return df
+    df = df.copy()
+    df['Date'] = [None] + df['Date'].iloc[1:].tolist()
+    return df
+
+
+class BackgroundFileSink:
+    # Writes files from a worker thread so requests never wait on the disk.
+    # Every file gets a unique name and is renamed into place only once it is
+    # complete, so concurrent workers never see or clobber partial files.
+    # When the queue is full the artifact is dropped rather than blocking.
+    enabled = True
+
+    def __init__(self, directory, maxsize=64, fmt='csv'):
+        if fmt not in SUFFIXES:
+            raise ValueError(f"unknown artifact format {fmt!r}, expected one of {', '.join(SUFFIXES)}")
+        self.directory = directory
+        self.fmt = fmt
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='artifact-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, name, df):
+        try:
+            self._queue.put_nowait((name, df))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except (OSError, ValueError, ImportError):
+                # ImportError: arrow or parquet requested without pyarrow
+                self.failed += 1
+
+    def _write(self, name, df):
+        filename = f'{name}-{os.getpid()}-{uuid.uuid4().hex}{SUFFIXES[self.fmt]}'
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            if self.fmt == 'csv':
+                with os.fdopen(fd, 'w', newline='') as f:
+                    df.to_csv(f, index=False)
+            else:
+                import pyarrow as pa
+
+                os.close(fd)
+                write_table(tmp_path, pa.Table.from_pandas(arrow_frame(df), preserve_index=False), fmt=self.fmt)
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def sink_from_setting(setting, fmt=None):
+    if not setting or setting == 'off':
+        return NullSink()
+    if setting == 'memory':
+        return MemorySink()
+    return BackgroundFileSink(setting, fmt=fmt or 'csv')
+
+
+artifact_sink = sink_from_setting(os.environ.get(ARTIFACTS_ENV), os.environ.get(ARTIFACTS_FORMAT_ENV))
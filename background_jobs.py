@@ -0,0 +1,75 @@
+import contextlib
+import os
+import tempfile
+import time
+
+
+# Heavy callbacks (the Monte Carlo follow-up financing runs) run as Dash
+# background callbacks: the request only starts a job process and the
+# browser polls for progress and the result, so the gunicorn worker is free
+# for everyone else meanwhile. Jobs, their results and the job slots live in
+# a diskcache directory, no broker needed. Set MORTGAGE_JOBS_DIR to a
+# directory shared by all workers on the machine (default: mortgage-jobs in
+# the temp directory).
+JOBS_DIR_ENV = 'MORTGAGE_JOBS_DIR'
+
+# finished job results are dropped after this many seconds
+JOB_EXPIRE = 3600
+JOB_CACHE_BYTES = 256 * 1024 * 1024
+
+# Jobs share a budget of processes: all cores but one, which is left for the
+# interactive callbacks. At most MORTGAGE_JOB_SLOTS jobs (default 2) run at
+# once, further ones wait for a free slot, and every job gets an equal part
+# of the budget. A slot held by a job that was killed (cancelled) is given
+# free after JOB_SLOT_EXPIRE seconds without progress.
+JOB_SLOTS_ENV = 'MORTGAGE_JOB_SLOTS'
+JOB_SLOT_EXPIRE = 120
+JOB_SLOT_POLL = 0.25
+
+
+def job_budget():
+    return max((os.cpu_count() or 1) - 1, 1)
+
+
+def job_slots():
+    return min(max(int(os.environ.get(JOB_SLOTS_ENV, 2)), 1), job_budget())
+
+
+def job_workers():
+    # processes a single job may use
+    return max(job_budget() // job_slots(), 1)
+
+
+@contextlib.contextmanager
+def job_slot(cache=None):
+    # Waits for one of the job slots and holds it for the with block. Yields
+    # a function to call on progress, which keeps the slot from expiring.
+    cache = cache if cache is not None else job_cache
+    while True:
+        for slot in range(job_slots()):
+            key = f'job-slot-{slot}'
+            if cache.add(key, os.getpid(), expire=JOB_SLOT_EXPIRE):
+                try:
+                    yield lambda: cache.touch(key, expire=JOB_SLOT_EXPIRE)
+                finally:
+                    cache.delete(key)
+                return
+        time.sleep(JOB_SLOT_POLL)
+
+
+def job_cache_from_setting(directory=None):
+    import diskcache
+
+    directory = directory or os.path.join(tempfile.gettempdir(), 'mortgage-jobs')
+    os.makedirs(directory, exist_ok=True)
+    return diskcache.Cache(directory, size_limit=JOB_CACHE_BYTES)
+
+
+def manager_from_cache(cache):
+    from dash import DiskcacheManager
+
+    return DiskcacheManager(cache, expire=JOB_EXPIRE)
+
+
+job_cache = job_cache_from_setting(os.environ.get(JOBS_DIR_ENV))
+background_manager = manager_from_cache(job_cache)
@@ -0,0 +1,216 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dash_utilities import generate_batch
+from scenario_api import SCHEDULE_FIELDS, summaries, validate_frame
+from schedule_storage import file_format, table_writer
+
+
+# Batch mode for portfolio files: reads loan applications from CSV or Parquet
+# in chunks, prices them on a process pool and writes Parquet, or Arrow IPC
+# for output paths ending in .arrow/.feather, which schedule_storage reads
+# back memory-mapped.
+#
+#   python batch_cli.py loans.csv -o summaries.parquet
+#   python batch_cli.py loans.parquet -o schedules.arrow --detail schedule --id-column loan_id
+#
+# Columns are named and scaled like generate_batch (rates as fractions).
+# --cents prices with integer-cent arithmetic, every amount in the output is
+# then int64 cents as on the lender's statements.
+# At most two chunks per worker are in flight, so memory stays bounded
+# however large the input is. Output rows keep the input order.
+
+CHUNK_ROWS = 2048
+
+# invalid rows reported by message, the rest are only counted
+REPORTED_ERRORS = 10
+
+FLOAT_SUMMARIES = ('Nettodarlehen', 'Fest_Monatsrate', 'residual_debt')
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    # (chunks, total rows or None) of the input file
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        chunks = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunk_rows))
+        return chunks, parquet.metadata.num_rows
+    return pd.read_csv(path, chunksize=chunk_rows), None
+
+
+def price_chunk(frame, start, detail='summary', id_column=None, arithmetic='float'):
+    # Summaries (one row per loan, with an 'error' column) or schedules (one
+    # row per loan and month) of one input chunk. Returns the output frame,
+    # None when a schedule chunk has no valid loan, and the errors of the
+    # invalid rows as (row, message).
+    frame = frame.reset_index(drop=True)
+    ids = frame.pop(id_column).to_numpy() if id_column else None
+    params, errors = validate_frame(frame)
+    valid = np.flatnonzero(errors == None)  # noqa: E711
+    row = start + np.arange(len(frame))
+    invalid = [(int(row[i]), errors[i]) for i in np.flatnonzero(errors != None)]  # noqa: E711
+
+    result = generate_batch({name: values[valid] for name, values in params.items()}, arithmetic) if valid.size else None
+
+    if detail == 'summary':
+        out = pd.DataFrame({'row': row})
+        if id_column:
+            out[id_column] = ids
+        summary = summaries(result) if result is not None else {}
+        # invalid loans and loans still open at the end have no payoff_month
+        for name in ('Nettodarlehen', 'Fest_Monatsrate', 'total_interest', 'payoff_month', 'residual_debt'):
+            floating = name in FLOAT_SUMMARIES and arithmetic == 'float'
+            column = pd.array(np.full(len(out), np.nan), dtype='Float64' if floating else 'Int64')
+            if name in summary:
+                column[valid] = summary[name]
+                if name == 'payoff_month':
+                    column[valid[summary[name] < 0]] = pd.NA
+            out[name] = column
+        out['error'] = pd.Series(errors, dtype='string')
+        return out, invalid
+
+    if result is None:
+        return None, invalid
+    loans, months = np.nonzero(result['in_horizon'])
+    out = pd.DataFrame({'row': row[valid][loans]})
+    if id_column:
+        out[id_column] = ids[valid][loans]
+    out['month'] = months + 1
+    for name in SCHEDULE_FIELDS:
+        out[name] = result[name][loans, months]
+    return out, invalid
+
+
+def _price_task(task):
+    return price_chunk(*task)
+
+
+def run(path, output, detail='summary', id_column=None, workers=None, chunk_rows=CHUNK_ROWS, progress=None,
+        arithmetic='float'):
+    # returns (loans read, number of invalid rows, the first REPORTED_ERRORS
+    # of them as (row, message), whether output was written); nothing is
+    # written when no loan is valid in schedule mode
+    import pyarrow as pa
+
+    file_format(output)
+    chunks, total = read_chunks(path, chunk_rows)
+    workers = workers or os.cpu_count() or 1
+    writer = schema = None
+    loans = invalid = 0
+    examples = []
+
+    def write(out):
+        nonlocal writer, schema
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        if writer is None:
+            # later chunks follow the first one, errors are always strings
+            schema = table.schema.remove_metadata()
+            if 'error' in schema.names:
+                schema = schema.set(schema.get_field_index('error'), pa.field('error', pa.string()))
+            writer = table_writer(output, schema)
+        writer.write_table(table.cast(schema))
+
+    def priced():
+        # (output, errors, loans) per chunk, in input order
+        tasks = ((chunk, start, detail, id_column, arithmetic) for chunk, start in _offsets(chunks))
+        if workers == 1:
+            for task in tasks:
+                yield (*_price_task(task), len(task[0]))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append((pool.submit(_price_task, task), len(task[0])))
+                if len(pending) >= 2 * workers:
+                    future, size = pending.popleft()
+                    yield (*future.result(), size)
+            while pending:
+                future, size = pending.popleft()
+                yield (*future.result(), size)
+
+    try:
+        for out, errors, size in priced():
+            if out is not None:
+                write(out)
+            invalid += len(errors)
+            examples.extend(errors[:REPORTED_ERRORS - len(examples)])
+            loans += size
+            if progress:
+                progress(loans, total)
+    finally:
+        if writer is not None:
+            writer.close()
+    return loans, invalid, examples, writer is not None
+
+
+def _offsets(chunks):
+    start = 0
+    for chunk in chunks:
+        yield chunk, start
+        start += len(chunk)
+
+
+def progress_printer(stream=sys.stderr):
+    started = time.perf_counter()
+
+    def report(done, total):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        share = f' ({done / total:.0%})' if total else ''
+        stream.write(f'\rpriced {done:,}{f" / {total:,}" if total else ""} loans{share}, {rate:,.0f} loans/s')
+        stream.flush()
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Price a portfolio file of loan applications.')
+    parser.add_argument('input', help='CSV or Parquet file, one loan per row')
+    parser.add_argument('-o', '--output', required=True, help='.parquet, .arrow or .feather file to write')
+    parser.add_argument('--detail', choices=['summary', 'schedule'], default='summary',
+                        help='one row per loan, or one row per loan and month')
+    parser.add_argument('--id-column', help='input column copied to the output instead of being priced')
+    parser.add_argument('--workers', type=int, help='processes to use (default: all cores)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--cents', action='store_true',
+                        help='integer-cent arithmetic rounded every month, amounts in cents')
+    parser.add_argument('--quiet', action='store_true', help='no progress output')
+    args = parser.parse_args(argv)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error('pyarrow is required for Parquet and Arrow output')
+    try:
+        file_format(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    progress = None if args.quiet else progress_printer()
+    loans, invalid, examples, written = run(
+        args.input, args.output, args.detail, args.id_column, args.workers, args.chunk_rows, progress,
+        'cents' if args.cents else 'float'
+    )
+    if progress:
+        sys.stderr.write('\n')
+    for row, message in examples:
+        sys.stderr.write(f'row {row}: {message}\n')
+    if invalid > len(examples):
+        sys.stderr.write(f'... {invalid - len(examples):,} more invalid rows\n')
+    if written:
+        sys.stderr.write(f'{loans - invalid:,} of {loans:,} loans priced, written to {args.output}\n')
+    else:
+        sys.stderr.write(f'no valid loan among {loans:,}, nothing written to {args.output}\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
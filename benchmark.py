@@ -0,0 +1,255 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from dash_utilities import generate_graph_df, generate_batch
+
+
+# Reproducible benchmarks for the engine and the Dash callbacks.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --output bench.json --baseline benchmark_baseline.json
+#   python benchmark.py --save-baseline benchmark_baseline.json
+#
+# With --baseline the run fails (exit code 1) when a median time or a
+# payload size is more than --tolerance above the stored baseline.
+
+LOAN = dict(
+    kaufpreis=500000,
+    Eigenkapital=100000,
+    Tilgungsrate=0.02,
+    Sollzins=0.035,
+    Sondertilgung_rate=0.05,
+    Grunderwerbsteuer_rate=0.005,
+    Maklerprovison_rate=0.0357,
+    Notarkosten_rate=0.02,
+    Grundbucheintrag_rate=0.005,
+)
+
+# 'standard' is still running at the end of every horizon, 'payoff' is
+# repaid after roughly nine years
+PAYOFF_CASES = {
+    'standard': dict(Tilgungsrate=0.02, Sondertilgung_rate=0.0),
+    'payoff': dict(Tilgungsrate=0.06, Sondertilgung_rate=0.05),
+}
+
+HORIZONS = [10, 20, 30, 40]
+
+# UI inputs of the default calculation, in the order of store_calculations
+FORM = {
+    'purchase-price': 500000,
+    'equity': 100000,
+    'broker-fee': 3.57,
+    'notary-fee': 2,
+    'real-estate-transfer-tax': 0.5,
+    'land-registry': 0.5,
+    'extra-payment': 5,
+    'repayment-rate': 2,
+    'interest-rate': 3.5,
+    'fixed-interest': 30,
+}
+
+
+def measure(func, repeat):
+    # one warm-up call, then repeat timed calls
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1e3)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'repeat': repeat}
+
+
+def bench_engine(repeat):
+    results = {}
+    for engine in ('numpy', 'loop'):
+        for case, overrides in PAYOFF_CASES.items():
+            for horizon in HORIZONS:
+                params = {**LOAN, **overrides, 'Sollzinsbindung': horizon}
+                results[f'engine.{engine}.{case}.{horizon}y'] = measure(
+                    lambda: generate_graph_df(**params, engine=engine), repeat
+                )
+    return results
+
+
+def bench_batch(repeat, scenarios=10000):
+    rng = np.random.default_rng(0)
+    params = pd.DataFrame({
+        'kaufpreis': rng.uniform(2e5, 1.5e6, scenarios).round(-3),
+        'Eigenkapital': rng.uniform(0, 3e5, scenarios).round(-3),
+        'Tilgungsrate': rng.choice([0.01, 0.02, 0.03, 0.05], scenarios),
+        'Sollzins': rng.uniform(0.01, 0.06, scenarios).round(4),
+        'Sollzinsbindung': rng.integers(10, 41, scenarios),
+        'Sondertilgung_rate': rng.choice([0, 0.05], scenarios),
+    })
+    results = {}
+    for name, arithmetic in (('batch.10k', 'float'), ('batch.10k.cents', 'cents')):
+        result = measure(lambda: generate_batch(params, arithmetic), max(repeat // 5, 3))
+        result['scenarios'] = scenarios
+        result['scenarios_per_s'] = scenarios / (result['median_ms'] / 1e3)
+        results[name] = result
+    return results
+
+
+def callback_payload(app, output, values, changed):
+    # request body of a Dash callback, values keyed by 'id.property'
+    spec = app.callback_map[output]
+
+    def props(items):
+        return [{**item, 'value': values.get(f"{item['id']}.{item['property']}")} for item in items]
+
+    outputs = [{'id': o.component_id, 'property': o.component_property} for o in spec['output']] \
+        if isinstance(spec['output'], list) else {'id': output.split('.')[0], 'property': output.split('.')[1]}
+    return {
+        'output': output,
+        'outputs': outputs,
+        'inputs': props(spec['inputs']),
+        'state': props(spec['state']),
+        'changedPropIds': [changed],
+    }
+
+
+def bench_callbacks(repeat):
+    import app_dash
+    from schedule_cache import variants_cache
+
+    app = app_dash.app
+    client = app_dash.server.test_client()
+    client.get('/')
+    results = {}
+
+    def call(output, values, changed):
+        body = json.dumps(callback_payload(app, output, values, changed))
+        response = client.post('/_dash-update-component', data=body, content_type='application/json')
+        assert response.status_code == 200, response.status_code
+        return len(body), response.data
+
+    def timed(name, output, values, changed, before=None):
+        sizes = {}
+
+        def run():
+            if before:
+                before()
+            sizes['request_bytes'], data = call(output, values, changed)
+            sizes['response_bytes'] = len(data)
+            sizes['data'] = data
+
+        result = measure(run, repeat)
+        data = sizes.pop('data')
+        result.update(sizes)
+        results[name] = result
+        return json.loads(data)['response']
+
+    form = {f'{component}.value': value for component, value in FORM.items()}
+    form['calculate-button.n_clicks'] = 1
+
+    def clear_caches():
+        variants_cache.clear()
+        app_dash.result_store.clear()
+
+    timed('callback.store_calculations.cold', 'calculation-store.data', form, 'calculate-button.n_clicks',
+          before=clear_caches)
+    response = timed('callback.store_calculations.warm', 'calculation-store.data', form, 'calculate-button.n_clicks')
+    store = response['calculation-store']['data']
+
+    timed('callback.update_graph', 'figure-store.data',
+          {'calculation-store.data': store}, 'calculation-store.data')
+    timed('callback.update_graph.zoom', 'figure-store.data',
+          {'calculation-store.data': store,
+           'mortgage-plot.relayoutData': {'xaxis.range[0]': 5, 'xaxis.range[1]': 10}},
+          'mortgage-plot.relayoutData')
+    table_output = '..table-store.data...mortgage-table.page_count..'
+    timed('callback.update_table', table_output,
+          {'calculation-store.data': store, 'mortgage-table.page_current': 3, 'mortgage-table.page_size': 20,
+           'mortgage-table.sort_by': [], 'mortgage-table.filter_query': ''},
+          'mortgage-table.page_current')
+
+    for fmt in ('csv', 'parquet'):
+        url = f"/download/{store['key']}.{fmt}?lang=en&params={quote(json.dumps(store['params']))}"
+        if client.get(url).status_code != 200:
+            continue
+
+        def download():
+            download.size = len(client.get(url).data)
+
+        result = measure(download, repeat)
+        result['response_bytes'] = download.size
+        results[f'route.download_table.{fmt}'] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # names of benchmarks that got slower or bigger than the baseline allows
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            continue
+        for metric in ('median_ms', 'request_bytes', 'response_bytes'):
+            if metric in current and metric in previous and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{name} {metric}: {previous[metric]:.4g} -> {current[metric]:.4g}')
+    return regressions
+
+
+def run(repeat, groups):
+    benchmarks = {}
+    if 'engine' in groups:
+        benchmarks.update(bench_engine(repeat))
+    if 'batch' in groups:
+        benchmarks.update(bench_batch(repeat))
+    if 'callbacks' in groups:
+        benchmarks.update(bench_callbacks(repeat))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'repeat': repeat,
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the mortgage engine and Dash callbacks.')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--save-baseline', help='write results as the new baseline to this file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='+', choices=['engine', 'batch', 'callbacks'],
+                        default=['engine', 'batch', 'callbacks'])
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.only)
+    for name, result in results['benchmarks'].items():
+        extra = ''.join(f" {key}={result[key]:.0f}" for key in ('request_bytes', 'response_bytes', 'scenarios_per_s')
+                        if key in result)
+        print(f"{name:45s} {result['median_ms']:10.3f} ms{extra}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
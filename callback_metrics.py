@@ -0,0 +1,251 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from dash.exceptions import PreventUpdate
+from flask import request
+
+
+# Timing, call/error counts and payload sizes of every server-side Dash
+# callback, rendered in the Prometheus text format. Set MORTGAGE_METRICS_DIR
+# to a directory shared by the gunicorn workers: each worker then writes its
+# own snapshot there from a background thread, at most every
+# SNAPSHOT_INTERVAL seconds, and /metrics adds up the snapshots of all
+# workers.
+METRICS_DIR_ENV = 'MORTGAGE_METRICS_DIR'
+SNAPSHOT_INTERVAL = 5.0
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'duration': ('mortgage_callback_duration_seconds', 'Time spent in the callback.', DURATION_BUCKETS),
+    'request_bytes': ('mortgage_callback_request_bytes', 'Size of the callback request body.', BYTES_BUCKETS),
+    'response_bytes': ('mortgage_callback_response_bytes', 'Size of the callback response body.', BYTES_BUCKETS),
+}
+
+# cache statistics are summed over all workers, gauges only over running ones
+CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'disk_hits', 'disk_misses')
+CACHE_GAUGES = ('size', 'maxsize')
+
+
+def _histogram(buckets):
+    return {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+
+
+def _observe(histogram, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+            break
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CallbackMetrics:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.pid = os.getpid()
+        self._callbacks = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._writer_pid = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def instrument(self, app):
+        # wrap every server-side callback registered on app so far,
+        # clientside callbacks have no Python function to time
+        for output, spec in app.callback_map.items():
+            func = spec.get('callback')
+            if func is not None and not hasattr(func, '__metrics__'):
+                spec['callback'] = self.wrap(getattr(func, '__name__', output), func)
+
+    def wrap(self, name, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            if request.args.get('cacheKey'):
+                # a browser poll of a running background callback, only the
+                # request that started the job counts as a call
+                return func(*args, **kwargs)
+            error = False
+            response = None
+            start = time.perf_counter()
+            try:
+                response = func(*args, **kwargs)
+                return response
+            except PreventUpdate:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.observe(name, time.perf_counter() - start, request.content_length or 0,
+                             _size(response), error)
+
+        timed.__metrics__ = name
+        return timed
+
+    def register_cache(self, name, cache):
+        # cache needs a stats() method returning a dict of numbers
+        self._caches[name] = cache
+
+    def observe(self, name, seconds, request_bytes, response_bytes, error=False):
+        with self._lock:
+            metrics = self._callbacks.get(name)
+            if metrics is None:
+                metrics = self._callbacks[name] = {
+                    'calls': 0,
+                    'errors': 0,
+                    **{key: _histogram(buckets) for key, (_, _, buckets) in HISTOGRAMS.items()},
+                }
+            metrics['calls'] += 1
+            metrics['errors'] += error
+            for key, value in (('duration', seconds), ('request_bytes', request_bytes),
+                               ('response_bytes', response_bytes)):
+                _observe(metrics[key], HISTOGRAMS[key][2], value)
+        if self.directory:
+            self._changed.set()
+            self._start_writer()
+
+    def _start_writer(self):
+        # one writer thread per process, started in the worker itself since
+        # threads don't survive the fork of a preloading server
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = self.pid = os.getpid()
+            threading.Thread(target=self._write_periodically, name='callback-metrics', daemon=True).start()
+            atexit.register(self._write)
+
+    def _write_periodically(self):
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            try:
+                self._write()
+            except OSError:
+                pass
+            time.sleep(SNAPSHOT_INTERVAL)
+
+    def snapshot(self):
+        with self._lock:
+            callbacks = json.loads(json.dumps(self._callbacks))
+        caches = {name: cache.stats() for name, cache in self._caches.items()}
+        return {'pid': self.pid, 'callbacks': callbacks, 'caches': caches}
+
+    def _write(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, os.path.join(self.directory, f'{self.pid}.json'))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _snapshots(self):
+        own = self.snapshot()
+        snapshots = [own]
+        if self.directory:
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json') or filename == f'{self.pid}.json':
+                    continue
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def render(self):
+        callbacks = {}
+        caches = {}
+        for snapshot in self._snapshots():
+            running = snapshot['pid'] == self.pid or _alive(snapshot['pid'])
+            for name, metrics in snapshot['callbacks'].items():
+                total = callbacks.setdefault(name, {
+                    'calls': 0,
+                    'errors': 0,
+                    **{key: _histogram(buckets) for key, (_, _, buckets) in HISTOGRAMS.items()},
+                })
+                total['calls'] += metrics['calls']
+                total['errors'] += metrics['errors']
+                for key in HISTOGRAMS:
+                    total[key]['buckets'] = [a + b for a, b in zip(total[key]['buckets'], metrics[key]['buckets'])]
+                    total[key]['sum'] += metrics[key]['sum']
+                    total[key]['count'] += metrics[key]['count']
+            for name, stats in snapshot['caches'].items():
+                total = caches.setdefault(name, {})
+                for key in CACHE_COUNTERS + CACHE_GAUGES:
+                    if key in stats and (key in CACHE_COUNTERS or running):
+                        total[key] = total.get(key, 0) + stats[key]
+
+        lines = []
+        for metric, key, description in (
+            ('mortgage_callback_calls_total', 'calls', 'Number of callback calls.'),
+            ('mortgage_callback_errors_total', 'errors', 'Number of callback calls that raised an error.'),
+        ):
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+            lines += [f'{metric}{{callback="{name}"}} {callbacks[name][key]}' for name in sorted(callbacks)]
+
+        for key, (metric, description, bounds) in HISTOGRAMS.items():
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} histogram']
+            for name in sorted(callbacks):
+                histogram = callbacks[name][key]
+                cumulative = 0
+                for bound, count in zip(bounds, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{callback="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{callback="{name}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{metric}_sum{{callback="{name}"}} {histogram["sum"]!r}')
+                lines.append(f'{metric}_count{{callback="{name}"}} {histogram["count"]}')
+
+        for key in CACHE_COUNTERS + CACHE_GAUGES:
+            names = sorted(name for name in caches if key in caches[name])
+            if not names:
+                continue
+            kind = 'counter' if key in CACHE_COUNTERS else 'gauge'
+            metric = f'mortgage_cache_{key}_total' if kind == 'counter' else f'mortgage_cache_{key}'
+            lines += [f'# HELP {metric} Cache {key.replace("_", " ")}.', f'# TYPE {metric} {kind}']
+            lines += [f'{metric}{{cache="{name}"}} {caches[name][key]}' for name in names]
+
+        names = sorted(caches)
+        if names:
+            metric = 'mortgage_cache_hit_ratio'
+            lines += [f'# HELP {metric} Share of cache lookups that were hits.', f'# TYPE {metric} gauge']
+            for name in names:
+                lookups = caches[name].get('hits', 0) + caches[name].get('misses', 0)
+                ratio = caches[name].get('hits', 0) / lookups if lookups else 0.0
+                lines.append(f'{metric}{{cache="{name}"}} {ratio!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _size(response):
+    if isinstance(response, str):
+        return len(response.encode('utf-8'))
+    if isinstance(response, bytes):
+        return len(response)
+    return 0
+
+
+callback_metrics = CallbackMetrics(os.environ.get(METRICS_DIR_ENV))
@@ -1,8 +1,17 @@
 import pandas as pd
+import numpy as np
+import functools
 import itertools
 import locale
 
 
+MONTH_ABBR = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# engine used by generate_graph_df when none is passed; 'loop' is the original
+# month-by-month implementation and is kept for comparison
+DEFAULT_ENGINE = 'numpy'
+
+
 def generate_graph_df(
     kaufpreis,
     Eigenkapital,
@@ -14,8 +23,456 @@ def generate_graph_df(
     Maklerprovison_rate=0.0357,
     Notarkosten_rate=0.015,
     Grundbucheintrag_rate=0.005,
+    Start_Date='2024-12-01',
+    engine=None
+):
+    engine = engine or DEFAULT_ENGINE
+    if engine == 'numpy':
+        generate = _generate_graph_df_numpy
+    elif engine == 'loop':
+        generate = _generate_graph_df_loop
+    else:
+        raise ValueError(f"unknown engine {engine!r}, expected 'numpy' or 'loop'")
+
+    return generate(
+        kaufpreis,
+        Eigenkapital,
+        Tilgungsrate,
+        Sollzins,
+        Sollzinsbindung,
+        Sondertilgung_rate,
+        Grunderwerbsteuer_rate,
+        Maklerprovison_rate,
+        Notarkosten_rate,
+        Grundbucheintrag_rate,
+        Start_Date
+    )
+
+
+def month_labels(Start_Date, months, language=None):
+    # "%b %Y" labels for the months following Start_Date ("%Y 一月" for zh).
+    # Every axis is built once per start month, horizon and language; the
+    # list returned is a fresh copy the caller may extend.
+    return list(_month_axis(_start_month(Start_Date), int(months), 'zh' if language == 'zh' else None))
+
+
+@functools.lru_cache(maxsize=64)
+def _start_month(Start_Date):
+    # months since 1970-01 of Start_Date
+    return int(np.datetime64(pd.to_datetime(Start_Date), 'M').astype(int))
+
+
+@functools.lru_cache(maxsize=256)
+def _month_axis(start, months, language):
+    return tuple(_labels(start + np.arange(1, months + 1), language).tolist())
+
+
+def _labels(month_index, language):
+    # labels of months counted since 1970-01
+    years = (1970 + month_index // 12).astype(str)
+    if language == 'zh':
+        names = np.array([CHINESE_MONTHS[abbr] for abbr in MONTH_ABBR])
+        return np.char.add(np.char.add(years, ' '), names[month_index % 12])
+    return np.char.add(np.char.add(np.array(MONTH_ABBR)[month_index % 12], ' '), years)
+
+
+def month_axis(Start_Date, months):
+    # datetime64[M] axis of a schedule: the start month, then one entry per
+    # month. Results keep this instead of label strings, see axis_labels.
+    return np.datetime64(_start_month(Start_Date), 'M') + np.arange(int(months) + 1)
+
+
+def axis_labels(axis, language=None):
+    # "%b %Y" (or zh) labels for the months of a month_axis or a part of it
+    return _labels(np.asarray(axis, dtype='datetime64[M]').astype(np.int64), 'zh' if language == 'zh' else None)
+
+
+def _amortize(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, months, Faktor=12, total_months=None):
+    # Closed form of the monthly recursion, one row per scenario
+    #   B_k = B_{k-1} * q - Fest_Monatsrate - Sondertilgung (every 12th month)
+    # i.e. B_k = q**k * (Nettodarlehen - sum_{m<=k} payment_m * q**-m)
+    Nettodarlehen = np.asarray(Nettodarlehen, dtype=float)[:, None]
+    Fest_Monatsrate = np.asarray(Fest_Monatsrate, dtype=float)[:, None]
+    Sollzins = np.asarray(Sollzins, dtype=float)[:, None]
+    Sondertilgung = np.asarray(Sondertilgung, dtype=float)[:, None]
+    months = np.asarray(months, dtype=np.int64)
+
+    if total_months is None:
+        total_months = int(months.max()) if months.size else 0
+    k = np.arange(1, total_months + 1)
+    # ragged horizons: months past a scenario's Sollzinsbindung are masked out
+    in_horizon = k <= months[:, None]
+
+    q = 1 + Sollzins / Faktor
+    sonder = np.where(k % 12 == 0, Sondertilgung, 0.0)
+    balance = q ** k * (Nettodarlehen - np.cumsum((Fest_Monatsrate + sonder) * q ** -k.astype(float), axis=1))
+
+    flat = q[:, 0] == 1
+    if flat.any():
+        # without interest the recursion is plain subtraction, replay it in the
+        # loop's order (rate first, Sondertilgung after) so results match exactly
+        payments = np.stack((np.broadcast_to(Fest_Monatsrate[flat], sonder[flat].shape), sonder[flat]), axis=2)
+        steps = np.subtract.accumulate(
+            np.concatenate((Nettodarlehen[flat], payments.reshape(flat.sum(), -1)), axis=1), axis=1
+        )
+        balance[flat] = steps[:, 2::2]
+
+    previous = np.concatenate((Nettodarlehen, balance[:, :-1]), axis=1)
+    # a month is only booked while the loan was still open before it,
+    # once paid off the balance is frozen
+    active = np.logical_and.accumulate(previous > 0, axis=1) & in_horizon
+
+    Zinszahlung = previous * Sollzins / Faktor
+    Tilgungszahlung = Fest_Monatsrate - Zinszahlung
+    totaltilgungszahlung = np.where(active, Nettodarlehen - balance, Nettodarlehen)
+
+    return {
+        'Zinszahlung': np.where(active, np.rint(Zinszahlung), 0).astype(np.int64),
+        'Tilgungszahlung': np.where(active, np.rint(Tilgungszahlung), 0).astype(np.int64),
+        'Sondertilgunszahlung': np.where(active, sonder, 0.0),
+        'totaltilgungszahlung': np.where(in_horizon, np.rint(totaltilgungszahlung), 0).astype(np.int64),
+        'aktuelle_Nettodarlehen': np.where(active & (balance > 0), np.rint(balance), 0.0),
+        'active': active,
+        'in_horizon': in_horizon,
+    }
+
+
+# Sollzins as an integer multiple of 1e-8 (0.000001 %), the interest of a
+# month is then balance * rate / (Faktor * RATE_SCALE) in exact integers
+RATE_SCALE = 10 ** 8
+
+
+def _amortize_cents(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, months, Faktor=12,
+                    total_months=None):
+    # Integer-cent variant of _amortize, booked like a bank statement: every
+    # month the interest is rounded half up to the cent and the balance
+    # carries the rounded amounts, so there is no drift over the years. The
+    # last rate and a Sondertilgung only pay what is still owed. Amounts are
+    # int64 cents. The recursion can't be put in closed form once every
+    # month is rounded, so the months are stepped through, each month over
+    # all scenarios at once.
+    Nettodarlehen = np.asarray(Nettodarlehen, dtype=np.int64)
+    Fest_Monatsrate = np.asarray(Fest_Monatsrate, dtype=np.int64)
+    rate = np.rint(np.asarray(Sollzins, dtype=float) * RATE_SCALE).astype(np.int64)
+    Sondertilgung = np.asarray(Sondertilgung, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+
+    if total_months is None:
+        total_months = int(months.max()) if months.size else 0
+    denominator = Faktor * RATE_SCALE
+
+    shape = (len(months), total_months)
+    Zinszahlung = np.empty(shape, dtype=np.int64)
+    Tilgungszahlung = np.empty(shape, dtype=np.int64)
+    Sondertilgunszahlung = np.zeros(shape, dtype=np.int64)
+    balance = np.empty(shape, dtype=np.int64)
+    ends = set(months.tolist())
+    current = Nettodarlehen.copy()
+    interest = np.empty_like(current)
+    principal = np.empty_like(current)
+    for m in range(total_months):
+        # past its Sollzinsbindung a scenario is dropped, and a repaid loan
+        # has balance 0, so both book nothing from then on
+        if m in ends:
+            current[months == m] = 0
+        np.multiply(current, rate, out=interest)
+        interest += denominator // 2
+        interest //= denominator
+        np.subtract(Fest_Monatsrate, interest, out=principal)
+        np.minimum(principal, current, out=principal)
+        current -= principal
+        Zinszahlung[:, m] = interest
+        Tilgungszahlung[:, m] = principal
+        if (m + 1) % 12 == 0:
+            sonder = np.minimum(Sondertilgung, current)
+            current -= sonder
+            Sondertilgunszahlung[:, m] = sonder
+        balance[:, m] = current
+
+    in_horizon = np.arange(1, total_months + 1) <= months[:, None]
+    previous = np.concatenate((Nettodarlehen[:, None], balance[:, :-1]), axis=1)
+    return {
+        'Zinszahlung': Zinszahlung,
+        'Tilgungszahlung': Tilgungszahlung,
+        'Sondertilgunszahlung': Sondertilgunszahlung,
+        'totaltilgungszahlung': np.where(in_horizon, Nettodarlehen[:, None] - balance, 0),
+        'aktuelle_Nettodarlehen': balance,
+        'active': (previous > 0) & in_horizon,
+        'in_horizon': in_horizon,
+    }
+
+
+# columns accepted by generate_batch and the value used when one is missing
+BATCH_PARAMETERS = {
+    'kaufpreis': None,
+    'Eigenkapital': None,
+    'Tilgungsrate': None,
+    'Sollzins': None,
+    'Sollzinsbindung': None,
+    'Sondertilgung_rate': 0.05,
+    'Grunderwerbsteuer_rate': 0.06,
+    'Maklerprovison_rate': 0.0357,
+    'Notarkosten_rate': 0.015,
+    'Grundbucheintrag_rate': 0.005,
+}
+
+
+# scenarios computed together in one block by generate_batch; the cent
+# engine steps month by month, so larger blocks pay off there
+BATCH_CHUNK = 256
+CENT_BATCH_CHUNK = 2048
+
+# generate_batch arithmetic: 'float' is the closed form in euros, 'cents'
+# the month by month integer booking of _amortize_cents
+ARITHMETIC = ('float', 'cents')
+
+
+def generate_batch(params=None, arithmetic='float', **columns):
+    # Vectorized generate_graph_df over many parameter sets at once.
+    # params is a DataFrame or a mapping of equally long arrays (scalars are
+    # broadcast), keyword columns override it. Every monthly result is a
+    # (scenario x month) array padded to the longest Sollzinsbindung;
+    # 'in_horizon' marks the months that belong to each scenario.
+    # With arithmetic='cents' every amount, Nettodarlehen, Sondertilgung and
+    # Fest_Monatsrate included, is int64 cents as on a bank statement.
+    if arithmetic not in ARITHMETIC:
+        raise ValueError(f"unknown arithmetic {arithmetic!r}, expected 'float' or 'cents'")
+    if params is None:
+        params = {}
+    elif isinstance(params, pd.DataFrame):
+        params = {name: params[name].to_numpy() for name in params.columns}
+    params = {**params, **columns}
+
+    unknown = set(params) - set(BATCH_PARAMETERS)
+    if unknown:
+        raise ValueError(f"unknown batch parameters: {', '.join(sorted(unknown))}")
+    missing = [name for name, default in BATCH_PARAMETERS.items() if default is None and name not in params]
+    if missing:
+        raise ValueError(f"missing batch parameters: {', '.join(missing)}")
+
+    values = np.broadcast_arrays(*(
+        np.atleast_1d(np.asarray(params.get(name, default), dtype=float))
+        for name, default in BATCH_PARAMETERS.items()
+    ))
+    p = dict(zip(BATCH_PARAMETERS, values))
+
+    Nettodarlehen, Sondertilgung, Fest_Monatsrate = _loan_terms(
+        p['kaufpreis'], p['Eigenkapital'], p['Tilgungsrate'], p['Sollzins'], p['Sondertilgung_rate'],
+        p['Grunderwerbsteuer_rate'], p['Maklerprovison_rate'], p['Notarkosten_rate'], p['Grundbucheintrag_rate']
+    )
+    months = p['Sollzinsbindung'].astype(np.int64) * 12
+    total_months = int(months.max()) if months.size else 0
+    amortize, block = _amortize, BATCH_CHUNK
+    if arithmetic == 'cents':
+        Nettodarlehen, Sondertilgung, Fest_Monatsrate = (
+            np.rint(np.asarray(values) * 100).astype(np.int64) for values in (Nettodarlehen, Sondertilgung, Fest_Monatsrate)
+        )
+        amortize, block = _amortize_cents, CENT_BATCH_CHUNK
+
+    # work through the scenarios in row blocks so the temporaries stay cache
+    # sized, which is several times faster than one pass over the whole grid
+    result = {}
+    for start in range(0, len(months), block):
+        rows = slice(start, start + block)
+        chunk = amortize(
+            Nettodarlehen[rows], Fest_Monatsrate[rows], p['Sollzins'][rows], Sondertilgung[rows], months[rows],
+            total_months=total_months
+        )
+        for name, values in chunk.items():
+            if name not in result:
+                result[name] = np.empty((len(months), total_months), dtype=values.dtype)
+            result[name][rows] = values
+
+    result.update(
+        Nettodarlehen=Nettodarlehen,
+        Sondertilgung=Sondertilgung,
+        Fest_Monatsrate=Fest_Monatsrate,
+        months=months,
+    )
+    return result
+
+
+def _loan_terms(kaufpreis, Eigenkapital, Tilgungsrate, Sollzins, Sondertilgung_rate, Grunderwerbsteuer_rate,
+                Maklerprovison_rate, Notarkosten_rate, Grundbucheintrag_rate, Faktor=12):
+    Nettodarlehen = kaufpreis*(1+Grunderwerbsteuer_rate+Maklerprovison_rate+Notarkosten_rate+Grundbucheintrag_rate)-Eigenkapital
+    Sondertilgung = Nettodarlehen*Sondertilgung_rate
+    Fest_Monatsrate = np.rint(((Tilgungsrate+Sollzins)*Nettodarlehen)/Faktor)
+    return Nettodarlehen, Sondertilgung, Fest_Monatsrate
+
+
+def generate_variants(
+    kaufpreis,
+    Eigenkapital,
+    Tilgungsrate,
+    Sollzins,
+    Sollzinsbindung,
+    Sondertilgung_rates=(0.05, 0),
+    Grunderwerbsteuer_rate=0.06,
+    Maklerprovison_rate=0.0357,
+    Notarkosten_rate=0.015,
+    Grundbucheintrag_rate=0.005,
     Start_Date='2024-12-01'
 ):
+    # One loan computed for several Sondertilgung rates in a single pass.
+    # The date axis, fees and monthly rate are shared; every schedule column
+    # comes back as a (variant x month) array laid out like generate_graph_df,
+    # i.e. with the leading start row. variant_df turns one row into the
+    # DataFrame generate_graph_df returns.
+    params = LoanParameters(
+        kaufpreis, Eigenkapital, Tilgungsrate, Sollzins, Sollzinsbindung, Sondertilgung_rates, Grunderwerbsteuer_rate,
+        Maklerprovison_rate, Notarkosten_rate, Grundbucheintrag_rate, Start_Date
+    )
+    months = params.Sollzinsbindung * 12
+    rates = np.asarray(params.Sondertilgung_rates)
+    Nettodarlehen, Sondertilgung, Fest_Monatsrate = _variant_terms(params)
+    arrays = _amortize(
+        np.full(len(rates), Nettodarlehen),
+        np.full(len(rates), Fest_Monatsrate),
+        np.full(len(rates), Sollzins),
+        Sondertilgung,
+        np.full(len(rates), months)
+    )
+    return _variants_result(params, arrays, Nettodarlehen, Fest_Monatsrate)
+
+
+class LoanParameters:
+    # inputs of generate_variants with the defaults filled in, one small
+    # record per calculation
+    __slots__ = ('kaufpreis', 'Eigenkapital', 'Tilgungsrate', 'Sollzins', 'Sollzinsbindung', 'Sondertilgung_rates',
+                 'Grunderwerbsteuer_rate', 'Maklerprovison_rate', 'Notarkosten_rate', 'Grundbucheintrag_rate',
+                 'Start_Date')
+
+    def __init__(self, kaufpreis, Eigenkapital, Tilgungsrate, Sollzins, Sollzinsbindung, Sondertilgung_rates=(0.05, 0),
+                 Grunderwerbsteuer_rate=0.06, Maklerprovison_rate=0.0357, Notarkosten_rate=0.015,
+                 Grundbucheintrag_rate=0.005, Start_Date='2024-12-01'):
+        self.kaufpreis = kaufpreis
+        self.Eigenkapital = Eigenkapital
+        self.Tilgungsrate = Tilgungsrate
+        self.Sollzins = Sollzins
+        self.Sollzinsbindung = int(Sollzinsbindung)
+        self.Sondertilgung_rates = tuple(np.atleast_1d(np.asarray(Sondertilgung_rates, dtype=float)).tolist())
+        self.Grunderwerbsteuer_rate = Grunderwerbsteuer_rate
+        self.Maklerprovison_rate = Maklerprovison_rate
+        self.Notarkosten_rate = Notarkosten_rate
+        self.Grundbucheintrag_rate = Grundbucheintrag_rate
+        self.Start_Date = Start_Date
+
+    def __repr__(self):
+        return f"LoanParameters({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+def _variant_terms(params):
+    return _loan_terms(
+        params.kaufpreis, params.Eigenkapital, params.Tilgungsrate, params.Sollzins,
+        np.asarray(params.Sondertilgung_rates), params.Grunderwerbsteuer_rate, params.Maklerprovison_rate,
+        params.Notarkosten_rate, params.Grundbucheintrag_rate
+    )
+
+
+def _variants_result(params, arrays, Nettodarlehen, Fest_Monatsrate):
+    variants = len(params.Sondertilgung_rates)
+    months = params.Sollzinsbindung * 12
+
+    def with_start(values, start=0):
+        return np.concatenate((np.full((variants, 1), start, dtype=values.dtype), values), axis=1)
+
+    Zinszahlung_List = with_start(arrays['Zinszahlung'])
+    Tilgungszahlung_List = with_start(arrays['Tilgungszahlung'])
+    Sondertilgunszahlung_List = with_start(arrays['Sondertilgunszahlung'])
+
+    return {
+        'params': params,
+        'months': month_axis(params.Start_Date, months),
+        'Years_List': np.cumsum(np.concatenate(([0], np.full(months, 0.08333)))),
+        'Sondertilgung_rates': np.asarray(params.Sondertilgung_rates),
+        'Nettodarlehen': Nettodarlehen,
+        'Fest_Monatsrate': Fest_Monatsrate,
+        'Zinszahlung_List': Zinszahlung_List,
+        'Zinszahlung_List_Cumu': np.cumsum(Zinszahlung_List, axis=1),
+        'Tilgungszahlung_List': Tilgungszahlung_List,
+        'Tilgungszahlung_List_Cumu': np.cumsum(Tilgungszahlung_List, axis=1),
+        'Sondertilgunszahlung_List': Sondertilgunszahlung_List,
+        'Sondertilgunszahlung_List_Cumu': np.cumsum(Sondertilgunszahlung_List, axis=1),
+        'totaltilgungszahlung_List': with_start(arrays['totaltilgungszahlung']),
+        'aktuelle_Nettodarlehen_List': with_start(arrays['aktuelle_Nettodarlehen'], Nettodarlehen),
+        # whether any Sondertilgung was actually booked in the variant
+        'Sondertilgung_booked': (arrays['active'] & (np.arange(1, months + 1) % 12 == 0)).any(axis=1),
+    }
+
+
+SCHEDULE_COLUMNS = [
+    'Date',
+    'Zinszahlung_List',
+    'Zinszahlung_List_Cumu',
+    'Tilgungszahlung_List',
+    'Tilgungszahlung_List_Cumu',
+    'Sondertilgunszahlung_List',
+    'Sondertilgunszahlung_List_Cumu',
+    'totaltilgungszahlung_List',
+    'aktuelle_Nettodarlehen_List',
+    'Years_List',
+]
+
+
+def variant_df(variants, index):
+    # the DataFrame of generate_graph_df, with its label strings and the 0
+    # of the start row in 'Date'
+    data = {'Date': [0] + axis_labels(variants['months'][1:]).tolist()}
+    for name in SCHEDULE_COLUMNS[1:]:
+        values = variants[name]
+        data[name] = values[index] if isinstance(values, np.ndarray) and values.ndim == 2 else values
+    if not variants['Sondertilgung_booked'][index]:
+        # the loop only ever booked integer zeros here
+        data['Sondertilgunszahlung_List'] = data['Sondertilgunszahlung_List'].astype(np.int64)
+        data['Sondertilgunszahlung_List_Cumu'] = data['Sondertilgunszahlung_List_Cumu'].astype(np.int64)
+    if len(data['Years_List']) == 1:
+        # without any month the loop's Years_List is just the integer start
+        data['Years_List'] = data['Years_List'].astype(np.int64)
+    return pd.DataFrame(data)
+
+
+def _generate_graph_df_numpy(
+    kaufpreis,
+    Eigenkapital,
+    Tilgungsrate,
+    Sollzins,
+    Sollzinsbindung,
+    Sondertilgung_rate,
+    Grunderwerbsteuer_rate,
+    Maklerprovison_rate,
+    Notarkosten_rate,
+    Grundbucheintrag_rate,
+    Start_Date
+):
+    variants = generate_variants(
+        kaufpreis,
+        Eigenkapital,
+        Tilgungsrate,
+        Sollzins,
+        Sollzinsbindung,
+        [Sondertilgung_rate],
+        Grunderwerbsteuer_rate,
+        Maklerprovison_rate,
+        Notarkosten_rate,
+        Grundbucheintrag_rate,
+        Start_Date
+    )
+    return variant_df(variants, 0)
+
+
+def _generate_graph_df_loop(
+    kaufpreis,
+    Eigenkapital,
+    Tilgungsrate,
+    Sollzins,
+    Sollzinsbindung,
+    Sondertilgung_rate,
+    Grunderwerbsteuer_rate,
+    Maklerprovison_rate,
+    Notarkosten_rate,
+    Grundbucheintrag_rate,
+    Start_Date
+):
 
     Date=pd.to_datetime(Start_Date)
     Faktor = 12
@@ -109,69 +566,130 @@ def generate_graph_df(
 
 
 
-def convert_to_chinese(years_month):
-    def convert_month(date_str):
-        month_mapping = {
-        "Jan": "一月",
-        "Feb": "二月",
-        "Mar": "三月",
-        "Apr": "四月",
-        "May": "五月",
-        "Jun": "六月",
-        "Jul": "七月",
-        "Aug": "八月",
-        "Sep": "九月",
-        "Oct": "十月",
-        "Nov": "十一月",
-        "Dec": "十二月"
-    }
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: indices of n_out points that keep the
+    # visual shape of the line, always including the first and last point
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    edges = np.append(edges, n)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def detail_indices(years, remaining_debt, x_range=None, max_points=150, mode='yearly'):
+    # Points of one trace to draw: every month inside x_range when that fits
+    # into max_points, otherwise a yearly (every 12th month) or LTTB reduced
+    # view of the visible part.
+    years = np.asarray(years)
+    indices = np.arange(len(years))
+    if x_range is not None:
+        inside = np.flatnonzero((years >= x_range[0]) & (years <= x_range[1]))
+        if inside.size:
+            # one extra point on each side so the line runs to the plot edge
+            indices = indices[max(inside[0] - 1, 0):inside[-1] + 2]
+    if len(indices) <= max_points:
+        return indices
+
+    if mode == 'lttb':
+        return indices[lttb_indices(years[indices], np.asarray(remaining_debt)[indices], max_points)]
+    yearly = indices[indices % 12 == 0]
+    if yearly[-1] != indices[-1]:
+        yearly = np.append(yearly, indices[-1])
+    if yearly[0] != indices[0]:
+        yearly = np.insert(yearly, 0, indices[0])
+    return yearly
 
 
+def format_euro(values):
+    # Vectorized f'€{x:,.2f}'. The characters are assembled as a code point
+    # matrix and viewed as a unicode array, so no Python code runs per value.
+    cents = np.rint(np.asarray(values, dtype=float) * 100).astype(np.int64).ravel()
+    negative = cents < 0
+    cents = np.abs(cents)
+    euros = cents // 100
+    digits = len(str(int(euros.max()))) if euros.size else 1
+    powers = 10 ** np.arange(digits, dtype=np.int64)
+
+    # right aligned "1,234,567.89" for the widest value, one column per char
+    columns = []
+    for place in range(digits - 1, -1, -1):
+        columns.append(place + 2)
+        if place and place % 3 == 0:
+            columns.append(',')
+    columns += ['.', 1, 0]
+    number = np.empty((len(cents), len(columns)), dtype=np.uint32)
+    for i, column in enumerate(columns):
+        if isinstance(column, str):
+            number[:, i] = ord(column)
+        else:
+            number[:, i] = 48 + (cents // (10 ** column)) % 10
+
+    # shift every row left to its own length and put the prefix in front;
+    # the zero padding at the end is dropped by numpy's unicode dtype
+    integer_digits = 1 + (euros[:, None] >= powers[1:]).sum(axis=1)
+    length = integer_digits + (integer_digits - 1) // 3 + 3
+    prefix = 1 + negative
+    width = len(columns) + 2
+    position = np.arange(width)
+    source = position - prefix[:, None] + (len(columns) - length)[:, None]
+    inside = (position >= prefix[:, None]) & (position < (prefix + length)[:, None])
+    chars = np.where(inside, np.take_along_axis(number, np.clip(source, 0, len(columns) - 1), axis=1), 0)
+    chars[:, 0] = ord('€')
+    chars[negative, 1] = ord('-')
+    return np.ascontiguousarray(chars, dtype=np.uint32).view(f'<U{width}').ravel()
+
+
+CHINESE_MONTHS = {
+    "Jan": "一月",
+    "Feb": "二月",
+    "Mar": "三月",
+    "Apr": "四月",
+    "May": "五月",
+    "Jun": "六月",
+    "Jul": "七月",
+    "Aug": "八月",
+    "Sep": "九月",
+    "Oct": "十月",
+    "Nov": "十一月",
+    "Dec": "十二月"
+}
+
+
+def convert_to_chinese(years_month):
+    def convert_month(date_str):
         # Parse the input and convert the month
         month, year = date_str.split()
-        chinese_month = month_mapping[month]
+        chinese_month = CHINESE_MONTHS[month]
         result = f"{year} {chinese_month}"
         return result
-    
-    return [0]+[ convert_month(date_str) for date_str in years_month[1:]]
 
-if __name__ == '__main__':
-    
-    kaufpreis=568000
-    Eigenkapital=113600
-    Maklerprovison_rate=0.0249
-    Notarkosten_rate=0.015
-    Grundbucheintrag_rate=0.005
-    Sondertilgung_rate=0.05
-    Tilgungsrate=0.01
-    Sollzins=0.0366
-    Sollzinsbindung=20
-
-
-    df=generate_graph_df(
-        kaufpreis=kaufpreis,
-        Eigenkapital=Eigenkapital,
-        Maklerprovison_rate=Maklerprovison_rate,
-        Notarkosten_rate=Notarkosten_rate,
-        Grundbucheintrag_rate=Grundbucheintrag_rate,
-        Sondertilgung_rate=Sondertilgung_rate,
-        Tilgungsrate=Tilgungsrate,
-        Sollzins=Sollzins,
-        Sollzinsbindung=Sollzinsbindung
-    )
+    labels = list(years_month[1:])
+    if labels:
+        # schedules run month by month from their first label, so the cached
+        # zh axis of that start month can be used as it is
+        month, year = labels[0].split()
+        start = (int(year) - 1970) * 12 + MONTH_ABBR.index(month) - 1
+        if list(_month_axis(start, len(labels), None)) == labels:
+            return [0] + list(_month_axis(start, len(labels), 'zh'))
+    return [0]+[ convert_month(date_str) for date_str in labels]
 
-    df.to_csv('with_repayment.csv', index=False)  # Set index=False to exclude the index column
-
-    df=generate_graph_df(
-        kaufpreis=kaufpreis,
-        Eigenkapital=Eigenkapital,
-        Maklerprovison_rate=Maklerprovison_rate,
-        Notarkosten_rate=Notarkosten_rate,
-        Grundbucheintrag_rate=Grundbucheintrag_rate,
-        Sondertilgung_rate=0,
-        Tilgungsrate=Tilgungsrate,
-        Sollzins=Sollzins,
-        Sollzinsbindung=Sollzinsbindung
-    )
-
-    df.to_csv('without_repayment.csv', index=False)  # Set index=False to exclude the index column
+if __name__ == '__main__':
+    # batch mode for portfolio files, see batch_cli
+    from batch_cli import main
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+import math
+
+import numpy as np
+
+from dash_utilities import _amortize, _loan_terms, month_labels
+from scenario_api import MAX_AMOUNT, MAX_RATE
+
+
+# Goal seek: the Tilgungsrate, Sondertilgung rate or the highest kaufpreis
+# that reaches a target payoff duration or stays within a monthly budget.
+#
+# Budgets are solved in closed form from Fest_Monatsrate. Payoff targets are
+# bracketed with the annuity formula and then narrowed down on the engine,
+# evaluating GRID candidates per round in one vectorized _amortize call.
+
+SOLVE_FOR = ('Tilgungsrate', 'Sondertilgung_rate', 'kaufpreis')
+TARGETS = ('payoff_years', 'budget')
+
+# resolution of solved rates (0.01 %) and candidates per narrowing round
+RATE_STEP = 1e-4
+GRID = 64
+
+# payoff is reported up to this many years, and payoff targets may not be
+# further away
+MAX_YEARS = 100
+
+
+def payoff_months(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, horizon):
+    # month in which each scenario is repaid, horizon + 1 when it is still
+    # open after horizon months
+    Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung))
+    )
+    arrays = _amortize(
+        Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, np.full(len(Nettodarlehen), horizon + 1)
+    )
+    return arrays['active'].sum(axis=1)
+
+
+def _smallest(feasible, lo, hi):
+    # smallest integer in (lo, hi] for which the monotone feasible() holds,
+    # feasible(hi) must be true; feasible takes an array of candidates
+    while hi - lo > 1:
+        candidates = np.unique(np.linspace(lo + 1, hi - 1, min(GRID, hi - lo - 1)).round().astype(np.int64))
+        ok = feasible(candidates)
+        if ok.any():
+            first = int(ok.argmax())
+            hi = int(candidates[first])
+            if first:
+                lo = int(candidates[first - 1])
+        else:
+            lo = int(candidates[-1])
+    return hi
+
+
+def annuity_payment(Nettodarlehen, Sollzins, months):
+    # monthly payment that repays Nettodarlehen in months without Sondertilgung
+    i = Sollzins / 12
+    if i == 0:
+        return Nettodarlehen / months
+    return Nettodarlehen * i / (1 - (1 + i) ** -months)
+
+
+def goal_seek(
+    solve_for,
+    target,
+    value,
+    kaufpreis,
+    Eigenkapital,
+    Tilgungsrate,
+    Sollzins,
+    Sondertilgung_rate=0.05,
+    Grunderwerbsteuer_rate=0.06,
+    Maklerprovison_rate=0.0357,
+    Notarkosten_rate=0.015,
+    Grundbucheintrag_rate=0.005,
+    Start_Date='2024-12-01'
+):
+    # Returns the solved parameter under 'value' (None when the target cannot
+    # be reached) with the resulting Fest_Monatsrate and payoff month. Rates
+    # are rounded to RATE_STEP and kaufpreis to whole euros, always on the
+    # side that still meets the target. Solved rates stay within MAX_RATE and
+    # kaufpreis within MAX_AMOUNT, the limits of a calculation.
+    if solve_for not in SOLVE_FOR:
+        raise ValueError(f"unknown goal seek variable {solve_for!r}, expected one of {', '.join(SOLVE_FOR)}")
+    if target not in TARGETS:
+        raise ValueError(f"unknown goal seek target {target!r}, expected one of {', '.join(TARGETS)}")
+    if target == 'budget' and solve_for == 'Sondertilgung_rate':
+        raise ValueError('the Sondertilgung rate does not change the monthly rate')
+    if target == 'payoff_years' and solve_for == 'kaufpreis':
+        # the payments scale with the loan, so the payoff date doesn't move
+        raise ValueError('the kaufpreis does not change the payoff date')
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError('the goal value must be a positive number')
+    if target == 'payoff_years' and value > MAX_YEARS:
+        raise ValueError(f'payoff targets must be at most {MAX_YEARS} years away')
+
+    params = dict(
+        kaufpreis=kaufpreis, Eigenkapital=Eigenkapital, Tilgungsrate=Tilgungsrate, Sollzins=Sollzins,
+        Sondertilgung_rate=Sondertilgung_rate, Grunderwerbsteuer_rate=Grunderwerbsteuer_rate,
+        Maklerprovison_rate=Maklerprovison_rate, Notarkosten_rate=Notarkosten_rate,
+        Grundbucheintrag_rate=Grundbucheintrag_rate
+    )
+    fees = 1 + Grunderwerbsteuer_rate + Maklerprovison_rate + Notarkosten_rate + Grundbucheintrag_rate
+
+    def terms(**overrides):
+        return _loan_terms(**{**params, **overrides})
+
+    if target == 'budget':
+        # Fest_Monatsrate is rounded to whole euros, so anything below half a
+        # euro over the budget still fits; the loops only fix up rounding ties
+        limit = math.floor(value) + 0.5
+        if solve_for == 'Tilgungsrate':
+            Nettodarlehen = terms()[0]
+            step = min(math.floor((12 * limit / Nettodarlehen - Sollzins) / RATE_STEP), round(MAX_RATE / RATE_STEP))
+            while step >= 0 and terms(Tilgungsrate=step * RATE_STEP)[2] > value:
+                step -= 1
+            solved = round(step * RATE_STEP, 6) if step >= 0 else None
+        else:
+            Nettodarlehen = 12 * limit / (Tilgungsrate + Sollzins) if Tilgungsrate + Sollzins > 0 else math.inf
+            price = math.floor(min((Nettodarlehen + Eigenkapital) / fees, MAX_AMOUNT)) if Nettodarlehen > 0 else None
+            while price is not None and price > 0 and terms(kaufpreis=price)[2] > value:
+                price -= 1
+            solved = price if price is not None and price > 0 else None
+    else:
+        horizon = int(round(value * 12))
+        if horizon <= 0:
+            return _result(solve_for, None, params, Start_Date)
+
+        if solve_for == 'Tilgungsrate':
+            Nettodarlehen, Sondertilgung, _ = terms()
+
+            def feasible(steps):
+                Fest_Monatsrate = terms(Tilgungsrate=steps * RATE_STEP)[2]
+                return payoff_months(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, horizon) <= horizon
+
+            # without Sondertilgung the annuity formula is exact up to
+            # rounding, with it the same rate is always enough
+            payment = annuity_payment(Nettodarlehen, Sollzins, horizon)
+            hi = math.ceil((12 * payment / Nettodarlehen - Sollzins) / RATE_STEP) + 1
+        else:
+            Nettodarlehen, _, Fest_Monatsrate = terms()
+
+            def feasible(steps):
+                Sondertilgung = Nettodarlehen * steps * RATE_STEP
+                return payoff_months(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, horizon) <= horizon
+
+            # paying the whole loan back in yearly installments is always enough
+            hi = math.ceil(1 / max(value, 1) / RATE_STEP) + 1
+
+        hi = max(hi, 1)
+        while not feasible(np.array([hi]))[0]:
+            if hi * RATE_STEP > MAX_RATE:
+                return _result(solve_for, None, params, Start_Date)
+            hi *= 2
+        solved = round(_smallest(feasible, -1, hi) * RATE_STEP, 6)
+        if solved > MAX_RATE:
+            solved = None
+
+    return _result(solve_for, solved, params, Start_Date)
+
+
+def _result(solve_for, solved, params, Start_Date):
+    result = {'solve_for': solve_for, 'value': solved, 'Fest_Monatsrate': None, 'payoff_month': None,
+              'payoff_date': None}
+    if solved is None:
+        return result
+    params = {**params, solve_for: solved}
+    Nettodarlehen, Sondertilgung, Fest_Monatsrate = _loan_terms(**params)
+    horizon = MAX_YEARS * 12
+    month = int(payoff_months(Nettodarlehen, Fest_Monatsrate, params['Sollzins'], Sondertilgung, horizon)[0])
+    result['Fest_Monatsrate'] = float(Fest_Monatsrate)
+    if month <= horizon:
+        result['payoff_month'] = month
+        result['payoff_date'] = month_labels(Start_Date, month)[-1]
+    return result
@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dash_utilities import generate_variants, month_labels
+
+
+# Monte Carlo of the follow-up financing (Anschlussfinanzierung): the debt left
+# after the Sollzinsbindung is refinanced at a stochastic rate, re-fixed every
+# Anschluss_Zinsbindung years, and amortized until it is repaid. By default the
+# borrower keeps paying Fest_Monatsrate; with Anschluss_Tilgungsrate the rate
+# is recomputed from the remaining debt at every refix instead.
+#
+# The simulated rate is the rate a new fixed-rate loan gets, starting at today's
+# Sollzins. 'vasicek' and 'cir' are sampled with their exact transition
+# between refix dates, so no monthly rate path is needed.
+
+RATE_MODELS = ('vasicek', 'cir')
+
+# paths simulated by one task; the split does not depend on the number of
+# workers, so a seed gives the same result on every machine
+PATH_CHUNK = 10000
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def rate_at_refix(model, r0, kappa, theta, sigma, intervals, paths, rng):
+    # (paths x refix) rates after each interval (in years) of the model
+    rates = np.empty((paths, len(intervals)))
+    r = np.full(paths, float(r0))
+    for i, dt in enumerate(intervals):
+        decay = np.exp(-kappa * dt)
+        if model == 'vasicek':
+            std = sigma * np.sqrt((1 - decay ** 2) / (2 * kappa))
+            r = r * decay + theta * (1 - decay) + std * rng.standard_normal(paths)
+        else:
+            # exact CIR step: scaled non-central chi-square
+            c = sigma ** 2 * (1 - decay) / (4 * kappa)
+            r = c * rng.noncentral_chisquare(4 * kappa * theta / sigma ** 2, np.maximum(r, 0) * decay / c)
+        rates[:, i] = r
+    return rates
+
+
+def _simulate_paths(residual, Fest_Monatsrate, Anschluss_Tilgungsrate, Sondertilgung, start_month, refix_rates,
+                    refix_months, max_months):
+    # month-by-month amortization of the residual debt on every path, in the
+    # order of the schedule engine: interest, rate, Sondertilgung every 12th
+    # month. Returns the interest paid and the payoff month of each path
+    # (counted from Start_Date, -1 when not repaid within max_months).
+    paths = refix_rates.shape[0]
+    balance = np.full(paths, float(residual))
+    interest = np.zeros(paths)
+    payoff = np.full(paths, -1, dtype=np.int64)
+    is_open = balance > 0
+    payment = np.full(paths, float(Fest_Monatsrate))
+
+    for m in range(max_months):
+        if m % refix_months == 0:
+            Sollzins = refix_rates[:, m // refix_months]
+            if Anschluss_Tilgungsrate is not None:
+                payment = np.rint((Anschluss_Tilgungsrate + Sollzins) * balance / 12)
+        k = start_month + m + 1
+        Zinszahlung = balance * Sollzins / 12
+        balance = np.where(is_open, balance - (payment - Zinszahlung), balance)
+        if k % 12 == 0:
+            balance = np.where(is_open, balance - Sondertilgung, balance)
+        interest += np.where(is_open, np.rint(Zinszahlung), 0)
+        closed = is_open & (balance <= 0)
+        payoff[closed] = k
+        is_open &= ~closed
+        if not is_open.any():
+            break
+    return interest, payoff
+
+
+def _simulate_chunk(task):
+    (seed, paths, model, r0, kappa, theta, sigma, spread, intervals, residual, Fest_Monatsrate,
+     Anschluss_Tilgungsrate, Sondertilgung, start_month, refix_months, max_months) = task
+    rng = np.random.default_rng(seed)
+    rates = rate_at_refix(model, r0, kappa, theta, sigma, intervals, paths, rng)
+    # a loan is never offered below 0 %, whatever the model does
+    refix_rates = np.maximum(rates + spread, 0.0)
+    interest, payoff = _simulate_paths(
+        residual, Fest_Monatsrate, Anschluss_Tilgungsrate, Sondertilgung, start_month, refix_rates, refix_months,
+        max_months
+    )
+    return interest, payoff, refix_rates[:, 0]
+
+
+def simulate_refinancing(
+    kaufpreis,
+    Eigenkapital,
+    Tilgungsrate,
+    Sollzins,
+    Sollzinsbindung,
+    Sondertilgung_rate=0.05,
+    Grunderwerbsteuer_rate=0.06,
+    Maklerprovison_rate=0.0357,
+    Notarkosten_rate=0.015,
+    Grundbucheintrag_rate=0.005,
+    Start_Date='2024-12-01',
+    model='vasicek',
+    kappa=0.15,
+    theta=0.035,
+    sigma=0.01,
+    spread=0.0,
+    Anschluss_Zinsbindung=10,
+    Anschluss_Tilgungsrate=None,
+    max_years=50,
+    paths=10000,
+    percentiles=PERCENTILES,
+    seed=None,
+    workers=None,
+    progress=None,
+):
+    # Percentile bands of total interest and payoff date over paths
+    # simulated follow-up rates. workers=1 runs in this process, None uses
+    # every core. progress is called with (paths done, paths) as chunks
+    # finish.
+    if model not in RATE_MODELS:
+        raise ValueError(f"unknown rate model {model!r}, expected one of {', '.join(RATE_MODELS)}")
+    if kappa <= 0 or sigma < 0 or (model == 'cir' and (sigma == 0 or theta <= 0)):
+        raise ValueError('rate model needs kappa > 0, sigma >= 0 and for cir sigma > 0, theta > 0')
+
+    variants = generate_variants(
+        kaufpreis, Eigenkapital, Tilgungsrate, Sollzins, Sollzinsbindung, (Sondertilgung_rate,),
+        Grunderwerbsteuer_rate, Maklerprovison_rate, Notarkosten_rate, Grundbucheintrag_rate, Start_Date
+    )
+    if variants['Nettodarlehen'] <= 0:
+        raise ValueError('Eigenkapital covers the whole purchase, there is no loan to refinance')
+    fixed_months = int(Sollzinsbindung) * 12
+    residual = float(variants['aktuelle_Nettodarlehen_List'][0, -1])
+    fixed_interest = float(variants['Zinszahlung_List_Cumu'][0, -1])
+    Sondertilgung = float(variants['Nettodarlehen'] * Sondertilgung_rate)
+    max_months = int(max_years) * 12
+    refix_months = int(Anschluss_Zinsbindung) * 12
+    refixes = -(-max_months // refix_months)
+    intervals = [float(Sollzinsbindung)] + [float(Anschluss_Zinsbindung)] * (refixes - 1)
+
+    percentiles = list(percentiles)
+    if residual <= 0:
+        # repaid within the Sollzinsbindung, nothing left to refinance
+        closed = np.flatnonzero(variants['aktuelle_Nettodarlehen_List'][0] <= 0)
+        interest = np.full(paths, fixed_interest)
+        payoff = np.full(paths, closed[0] if closed.size else fixed_months)
+        first_rates = np.full(paths, np.nan)
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(-(-paths // PATH_CHUNK))
+        tasks = [
+            (child, min(PATH_CHUNK, paths - i * PATH_CHUNK), model, Sollzins, kappa, theta, sigma, spread,
+             intervals, residual, float(variants['Fest_Monatsrate']), Anschluss_Tilgungsrate, Sondertilgung,
+             fixed_months, refix_months, max_months)
+            for i, child in enumerate(seeds)
+        ]
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        chunks = []
+
+        def collect(results):
+            for chunk in results:
+                chunks.append(chunk)
+                if progress:
+                    progress(sum(len(c[0]) for c in chunks), paths)
+
+        if workers == 1:
+            collect(_simulate_chunk(task) for task in tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                collect(pool.map(_simulate_chunk, tasks))
+        interest = fixed_interest + np.concatenate([chunk[0] for chunk in chunks])
+        payoff = np.concatenate([chunk[1] for chunk in chunks])
+        first_rates = np.concatenate([chunk[2] for chunk in chunks])
+
+    repaid = payoff >= 0
+    # paths still open at the end count as repaid in the last month
+    payoff_months = np.where(repaid, payoff, fixed_months + max_months)
+    payoff_bands = np.percentile(payoff_months, percentiles, method='higher').astype(np.int64)
+    labels = month_labels(Start_Date, int(payoff_bands.max()))
+
+    return {
+        'paths': paths,
+        'percentiles': percentiles,
+        'residual': residual,
+        'fixed_interest': fixed_interest,
+        'total_interest': np.percentile(interest, percentiles),
+        'payoff_months': payoff_bands,
+        'payoff_date': [labels[m - 1] for m in payoff_bands.tolist()],
+        'followup_rate': np.nanpercentile(first_rates, percentiles) if residual > 0 else np.full(len(percentiles), np.nan),
+        'not_repaid': float(1 - repaid.mean()),
+    }
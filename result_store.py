@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from schedule_storage import open_table, result_table, table_result, write_table
+
+
+# Calculation results stay on the server, the browser only keeps their key.
+# Set MORTGAGE_RESULT_DIR to also keep them on local disk, so every gunicorn
+# worker on the machine can read results computed by another one.
+# MORTGAGE_RESULT_FORMAT picks the file format there: 'pickle' (default) or
+# 'arrow' for memory-mapped Arrow IPC files, see schedule_storage. The
+# directory must be private to the user running the app: pickles are loaded
+# from it, so anyone who can write there could run code in the app.
+# MORTGAGE_RESULT_MAX_FILES bounds the number of results kept on disk.
+RESULT_DIR_ENV = 'MORTGAGE_RESULT_DIR'
+RESULT_FORMAT_ENV = 'MORTGAGE_RESULT_FORMAT'
+RESULT_MAX_FILES_ENV = 'MORTGAGE_RESULT_MAX_FILES'
+
+DISK_MAX_FILES = 10000
+# puts between two sweeps of the directory, and the age after which a
+# temporary file is taken as left behind by a crashed worker
+SWEEP_EVERY = 256
+STALE_TMP_SECONDS = 3600
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# part of every file name, raised whenever the layout of a result changes so
+# files of an older release are never read as current ones
+RESULT_LAYOUT = 2
+
+
+def result_key(params):
+    # content hash of the canonical calculation parameters
+    payload = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class MemoryResultStore:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._results),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def private_directory(directory):
+    # creates directory for this user only, or checks that an existing one
+    # is owned by this user and not writable by anyone else
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f'result directory {directory!r} belongs to another user')
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f'result directory {directory!r} is writable by other users')
+
+
+class DiskResultStore:
+    # Read-through store: results are kept in memory and pickled into
+    # directory, written to a temporary file first and renamed into place.
+    # Only ever reads files this application wrote itself, from a directory
+    # no other user can write to. Every SWEEP_EVERY puts the oldest files
+    # beyond max_files are removed; a file read from disk counts as new.
+    suffix = '.pkl'
+
+    def __init__(self, directory, memory=None, max_files=DISK_MAX_FILES):
+        self.directory = directory
+        self.memory = memory or MemoryResultStore()
+        self.max_files = max_files
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+        self._puts = 0
+        private_directory(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.v{RESULT_LAYOUT}{self.suffix}')
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _dump(self, result, path):
+        with open(path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get(self, key):
+        if not isinstance(key, str) or not KEY_PATTERN.fullmatch(key):
+            return None
+        result = self.memory.get(key)
+        if result is None:
+            try:
+                result = self._load(self._path(key))
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                self.disk_misses += 1
+                return None
+            self.disk_hits += 1
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+            self.memory.put(key, result)
+        return result
+
+    def clear(self):
+        # only forgets the in-memory copies, files are shared with other workers
+        self.memory.clear()
+
+    def stats(self):
+        # memory misses that were found on disk count as disk hits
+        return {**self.memory.stats(), 'disk_hits': self.disk_hits, 'disk_misses': self.disk_misses,
+                'disk_evictions': self.disk_evictions}
+
+    def put(self, key, result):
+        self.memory.put(key, result)
+        if os.path.exists(self._path(key)):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            self._dump(result, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._puts += 1
+        if self._puts % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self):
+        # Drops the least recently used results beyond max_files, files of an
+        # older RESULT_LAYOUT and temporary files nobody finished. Other
+        # workers may sweep at the same time, so files can vanish meanwhile.
+        now = time.time()
+        current = []
+        for entry in os.scandir(self.directory):
+            try:
+                modified = entry.stat().st_mtime
+            except OSError:
+                continue
+            if entry.name.endswith(f'.v{RESULT_LAYOUT}{self.suffix}'):
+                current.append((modified, entry.path))
+            elif entry.name.endswith('.tmp') and now - modified < STALE_TMP_SECONDS:
+                continue
+            elif entry.name.endswith(('.tmp', self.suffix)):
+                self._remove(entry.path)
+        current.sort()
+        for _, path in current[:max(len(current) - self.max_files, 0)]:
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return
+        self.disk_evictions += 1
+
+
+class ArrowResultStore(DiskResultStore):
+    # Same as DiskResultStore, but results are Arrow IPC files that are
+    # memory-mapped on read: the arrays handed out are views on the file.
+    suffix = '.arrow'
+
+    def _load(self, path):
+        return table_result(open_table(path))
+
+    def _dump(self, result, path):
+        write_table(path, result_table(result), fmt='arrow')
+
+
+def store_from_setting(directory, fmt=None, max_files=None):
+    if directory:
+        store = ArrowResultStore if fmt == 'arrow' else DiskResultStore
+        return store(directory, max_files=int(max_files or DISK_MAX_FILES))
+    return MemoryResultStore()
+
+
+result_store = store_from_setting(
+    os.environ.get(RESULT_DIR_ENV), os.environ.get(RESULT_FORMAT_ENV), os.environ.get(RESULT_MAX_FILES_ENV)
+)
@@ -0,0 +1,180 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from dash_utilities import ARITHMETIC, BATCH_PARAMETERS, generate_batch
+
+
+# Bulk pricing for partner systems: batches of parameter sets in, one NDJSON
+# line per scenario out. Parameters are named and scaled like generate_batch,
+# i.e. rates as fractions (0.035, not 3.5). Scenarios are validated and priced
+# API_CHUNK at a time and every block is sent as soon as it is done, so no
+# request ever builds the whole response in memory. With arithmetic='cents'
+# amounts are integer cents, booked month by month as on a bank statement.
+
+API_CHUNK = 1024
+
+DETAILS = ('summary', 'schedule')
+
+MAX_SOLLZINSBINDUNG = 50
+
+# Upper limits, well above any real loan. With fees of at most MAX_RATE each
+# the loan stays below 5e10 cents, so neither the float engine's int64 casts
+# nor the integer products of the cent engine can overflow.
+MAX_AMOUNT = 1e8
+MAX_RATE = 1.0
+AMOUNTS = ('kaufpreis', 'Eigenkapital')
+RATES = (
+    'Tilgungsrate',
+    'Sollzins',
+    'Sondertilgung_rate',
+    'Grunderwerbsteuer_rate',
+    'Maklerprovison_rate',
+    'Notarkosten_rate',
+    'Grundbucheintrag_rate',
+)
+
+# monthly arrays returned with detail=schedule
+SCHEDULE_FIELDS = (
+    'Zinszahlung',
+    'Tilgungszahlung',
+    'Sondertilgunszahlung',
+    'totaltilgungszahlung',
+    'aktuelle_Nettodarlehen',
+)
+
+NON_NEGATIVE = (
+    'Eigenkapital',
+    'Tilgungsrate',
+    'Sollzins',
+    'Sondertilgung_rate',
+    'Grunderwerbsteuer_rate',
+    'Maklerprovison_rate',
+    'Notarkosten_rate',
+    'Grundbucheintrag_rate',
+)
+
+
+def list_blocks(scenarios, size=API_CHUNK):
+    for start in range(0, len(scenarios), size):
+        yield scenarios[start:start + size]
+
+
+def ndjson_blocks(lines, size=API_CHUNK):
+    # one scenario per line, blank lines are skipped and lines that are not
+    # JSON are passed on as None so they get an error line of their own
+    block = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            block.append(json.loads(line))
+        except ValueError:
+            block.append(None)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def validate(records):
+    # validate_frame for one block of decoded JSON records
+    n = len(records)
+    is_object = np.fromiter((isinstance(record, dict) for record in records), dtype=bool, count=n)
+    frame = pd.DataFrame.from_records([record if ok else {} for record, ok in zip(records, is_object)],
+                                      index=range(n))
+    return validate_frame(frame, is_object)
+
+
+def validate_frame(frame, is_object=None):
+    # Column-wise checks of one block of scenarios. Returns the parameter
+    # columns, with defaults filled in, and the first error of every row
+    # (None for valid rows).
+    n = len(frame)
+    if is_object is None:
+        is_object = np.ones(n, dtype=bool)
+    errors = np.full(n, None, dtype=object)
+
+    def fail(mask, message):
+        errors[np.asarray(mask) & (errors == None)] = message  # noqa: E711
+
+    fail(~is_object, 'expected a JSON object per scenario')
+    for name in frame.columns.difference(list(BATCH_PARAMETERS)):
+        fail(frame[name].notna(), f'unknown parameter {name}')
+
+    params = {}
+    for name, default in BATCH_PARAMETERS.items():
+        raw = frame[name] if name in frame else pd.Series(np.nan, index=frame.index, dtype=float)
+        given = raw.notna().to_numpy()
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=float)
+        if default is None:
+            fail(is_object & ~given, f'missing parameter {name}')
+        fail(given & ~np.isfinite(values), f'{name} must be a number')
+        params[name] = np.where(given, values, np.nan if default is None else default)
+
+    with np.errstate(invalid='ignore'):
+        fail(params['kaufpreis'] <= 0, 'kaufpreis must be positive')
+        for name in NON_NEGATIVE:
+            fail(params[name] < 0, f'{name} must not be negative')
+        for name in AMOUNTS:
+            fail(params[name] > MAX_AMOUNT, f'{name} must not exceed {MAX_AMOUNT:,.0f}')
+        for name in RATES:
+            fail(params[name] > MAX_RATE, f'{name} must not exceed {MAX_RATE:g}')
+        years = params['Sollzinsbindung']
+        fail((years % 1 != 0) | (years < 1) | (years > MAX_SOLLZINSBINDUNG),
+             f'Sollzinsbindung must be a whole number of years from 1 to {MAX_SOLLZINSBINDUNG}')
+        fees = (params['Grunderwerbsteuer_rate'] + params['Maklerprovison_rate'] + params['Notarkosten_rate']
+                + params['Grundbucheintrag_rate'])
+        fail(params['kaufpreis'] * (1 + fees) <= params['Eigenkapital'], 'Eigenkapital covers the whole purchase')
+    return params, errors
+
+
+def summaries(result):
+    # per scenario figures of a generate_batch result; payoff_month is -1
+    # when the loan is still open at the end of the Sollzinsbindung
+    months = result['months']
+    rows = np.arange(len(months))
+    # repaid in the first month whose remaining debt shows as 0
+    repaid = (result['aktuelle_Nettodarlehen'] == 0) & result['in_horizon']
+    return {
+        'Nettodarlehen': np.round(result['Nettodarlehen'], 2),
+        'Fest_Monatsrate': result['Fest_Monatsrate'],
+        'total_interest': result['Zinszahlung'].sum(axis=1),
+        'payoff_month': np.where(repaid.any(axis=1), repaid.argmax(axis=1) + 1, -1),
+        'residual_debt': result['aktuelle_Nettodarlehen'][rows, months - 1],
+    }
+
+
+def scenario_lines(blocks, detail='summary', arithmetic='float'):
+    # NDJSON text for each block of records, lines in input order; invalid
+    # scenarios get {"index": ..., "error": ...} instead of a result
+    if detail not in DETAILS:
+        raise ValueError(f"unknown detail {detail!r}, expected one of {', '.join(DETAILS)}")
+    if arithmetic not in ARITHMETIC:
+        raise ValueError(f"unknown arithmetic {arithmetic!r}, expected one of {', '.join(ARITHMETIC)}")
+
+    offset = 0
+    for records in blocks:
+        params, errors = validate(records)
+        valid = np.flatnonzero(errors == None)  # noqa: E711
+        lines = [None] * len(records)
+        for i in np.flatnonzero(errors != None).tolist():  # noqa: E711
+            lines[i] = json.dumps({'index': offset + i, 'error': errors[i]})
+
+        if valid.size:
+            result = generate_batch({name: values[valid] for name, values in params.items()}, arithmetic)
+            summary = {name: values.tolist() for name, values in summaries(result).items()}
+            for row, i in enumerate(valid.tolist()):
+                line = {'index': offset + i}
+                line.update((name, values[row]) for name, values in summary.items())
+                if line['payoff_month'] < 0:
+                    line['payoff_month'] = None
+                if detail == 'schedule':
+                    months = int(result['months'][row])
+                    line['schedule'] = {name: result[name][row, :months].tolist() for name in SCHEDULE_FIELDS}
+                lines[i] = json.dumps(line)
+
+        offset += len(records)
+        yield '\n'.join(lines) + '\n'
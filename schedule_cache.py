@@ -0,0 +1,139 @@
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from dash_utilities import generate_graph_df, generate_variants
+
+
+def signature_parameters(compute):
+    # parameters of a schedule function in call order, with their defaults
+    return {
+        name: parameter.default
+        for name, parameter in inspect.signature(compute).parameters.items()
+        if name != 'engine'
+    }
+
+
+SCHEDULE_PARAMETERS = signature_parameters(generate_graph_df)
+
+# decimals kept for float parameters, so 3.57/100 and 0.0357 share one entry
+FLOAT_DECIMALS = 10
+
+
+def _canonical_float(value):
+    return round(float(value), FLOAT_DECIMALS) + 0.0
+
+
+def canonical_parameters(spec=SCHEDULE_PARAMETERS, **params):
+    # fill in defaults and normalize types and float noise so equivalent
+    # inputs produce the same key
+    unknown = set(params) - set(spec)
+    if unknown:
+        raise TypeError(f"unexpected schedule parameters: {', '.join(sorted(unknown))}")
+
+    canonical = {}
+    for name, default in spec.items():
+        value = params.get(name, default)
+        if value is inspect.Parameter.empty:
+            raise TypeError(f"missing schedule parameter: {name}")
+        if name == 'Sollzinsbindung':
+            value = int(value)
+        elif name == 'Start_Date':
+            value = pd.Timestamp(value).strftime('%Y-%m-%d')
+        elif np.ndim(value):
+            value = tuple(_canonical_float(v) for v in np.ravel(value))
+        else:
+            value = _canonical_float(value)
+        canonical[name] = value
+    return canonical
+
+
+def _shared(value):
+    # cached DataFrames are handed out as copies, array results are frozen
+    # once and then shared
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return value
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            if isinstance(item, np.ndarray):
+                item.flags.writeable = False
+    return value
+
+
+class ScheduleCache:
+    # Bounded LRU cache with a time to live for schedule results, by default
+    # of generate_graph_df.
+    # One instance lives per process, so every gunicorn worker keeps its own.
+
+    def __init__(self, maxsize=256, ttl=600, compute=generate_graph_df, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.compute = compute
+        self.parameters = signature_parameters(compute)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, **params):
+        key_params = canonical_parameters(self.parameters, **params)
+        key = tuple(key_params.values())
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _shared(result)
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # computed outside the lock, concurrent misses on one key just race
+        result = _freeze(self.compute(**key_params))
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return _shared(result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+variants_cache = ScheduleCache(compute=generate_variants)
+
+
+def cached_generate_variants(**params):
+    return variants_cache.get(**params)
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+# Columnar storage for computed schedules. Arrow IPC files (.arrow or
+# .feather, uncompressed) are memory-mapped when read, so numeric columns
+# come back as read-only numpy views on the page cache: nothing is parsed,
+# copied or recomputed. Parquet (.parquet) is smaller on disk but decoded on
+# read. pyarrow (see requirements.txt) is only imported when a file is
+# touched.
+
+IPC_SUFFIXES = ('.arrow', '.feather')
+SUFFIXES = IPC_SUFFIXES + ('.parquet',)
+
+
+def file_format(path, fmt=None):
+    # 'arrow' or 'parquet', from the suffix of path unless fmt is given
+    if fmt is None:
+        if str(path).endswith(IPC_SUFFIXES):
+            fmt = 'arrow'
+        elif str(path).endswith('.parquet'):
+            fmt = 'parquet'
+        else:
+            raise ValueError(f"unknown schedule file type {path!r}, expected one of {', '.join(SUFFIXES)}")
+    if fmt not in ('arrow', 'parquet'):
+        raise ValueError(f"unknown schedule file format {fmt!r}, expected 'arrow' or 'parquet'")
+    return fmt
+
+
+def table_writer(path, schema, fmt=None):
+    # writer with write_table() and close() for the file type of path
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format(path, fmt) == 'arrow':
+        return pa.ipc.new_file(str(path), schema)
+    return pq.ParquetWriter(str(path), schema)
+
+
+def write_table(path, table, fmt=None):
+    writer = table_writer(path, table.schema, fmt)
+    try:
+        writer.write_table(table)
+    finally:
+        writer.close()
+
+
+def open_table(path, fmt=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format(path, fmt) == 'arrow':
+        with pa.memory_map(str(path)) as source:
+            # the buffers keep the mapping alive after the file is closed
+            return pa.ipc.open_file(source).read_all()
+    return pq.read_table(str(path), memory_map=True)
+
+
+def column_array(table, name):
+    # numpy view of a column where Arrow allows it, a copy otherwise
+    # (nulls, strings, or a column split over several record batches)
+    column = table.column(name)
+    if column.num_chunks == 1 and column.null_count == 0:
+        chunk = column.chunk(0)
+        try:
+            return chunk.to_numpy(zero_copy_only=True)
+        except Exception:
+            pass
+    return column.to_numpy()
+
+
+def result_table(result):
+    # calculation result of app_dash.calculate_result as one Arrow table;
+    # Arrow has no month unit, 'months' is stored as the first day of each
+    import pyarrow as pa
+
+    months = np.asarray(result['months'], dtype='datetime64[M]').astype('datetime64[D]')
+    columns = {'months': pa.array(months, pa.date32()), 'years': result['years']}
+    for scenario, metrics in result['scenarios'].items():
+        for metric, values in metrics.items():
+            columns[f'{scenario}/{metric}'] = np.asarray(values)
+    # tranche names are free text, the metric is after the last '/'
+    for name, metrics in result.get('tranches', {}).items():
+        for metric, values in metrics.items():
+            columns[f'tranche:{name}/{metric}'] = np.asarray(values)
+    return pa.table(columns)
+
+
+def table_result(table):
+    # inverse of result_table, numeric columns stay views on the table
+    result = {
+        'months': table.column('months').to_numpy().astype('datetime64[M]'),
+        'years': column_array(table, 'years'),
+        'scenarios': {},
+    }
+    for name in table.column_names:
+        if name.startswith('tranche:'):
+            tranche, metric = name[len('tranche:'):].rsplit('/', 1)
+            result.setdefault('tranches', {}).setdefault(tranche, {})[metric] = column_array(table, name)
+        elif '/' in name:
+            scenario, metric = name.split('/', 1)
+            result['scenarios'].setdefault(scenario, {})[metric] = column_array(table, name)
+    return result
+
+
+class ScheduleFile:
+    # Memory-mapped schedules written by batch_cli --detail schedule, one
+    # row per loan and month sorted by 'row'. schedule() slices one loan out
+    # without reading the rest of the file.
+
+    def __init__(self, path):
+        self.table = open_table(path)
+        self.rows = column_array(self.table, 'row')
+
+    def __len__(self):
+        return len(np.unique(self.rows))
+
+    def schedule(self, row):
+        start, stop = np.searchsorted(self.rows, [row, row + 1])
+        if start == stop:
+            raise KeyError(row)
+        part = self.table.slice(start, stop - start)
+        return {name: column_array(part, name) for name in part.column_names}
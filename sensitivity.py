@@ -0,0 +1,104 @@
+import numpy as np
+
+from dash_utilities import generate_batch
+from scenario_api import summaries
+
+
+# Sensitivity of one loan to Sollzins x Tilgungsrate, optionally also over
+# several Sondertilgung rates. The whole grid is priced in one generate_batch
+# call; the payoff year, which lies beyond the Sollzinsbindung, comes from the
+# closed form of the balance at every year end, assuming the Sollzins is kept.
+
+# the axes run GRID_SPAN (in rate points) to either side of the current
+# value in steps of GRID_STEP_BP basis points, so the current value is
+# always on the grid
+GRID_SPAN = 0.02
+GRID_STEP_BP = 10
+
+# payoff is reported up to this many years
+MAX_YEARS = 100
+
+METRICS = ('total_interest', 'residual_debt', 'payoff_year')
+
+
+def grid_axis(value, span=GRID_SPAN, step_bp=GRID_STEP_BP):
+    # rates around value in whole basis point steps, never below 0
+    steps = int(round(span * 10000 / step_bp))
+    offsets = np.arange(-steps, steps + 1) * step_bp
+    # counted in hundredths of a basis point, so the steps are exact
+    axis = (round(value * 1e6) + offsets * 100) / 1e6
+    return axis[axis >= 0]
+
+
+def payoff_years(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, max_years=MAX_YEARS, Faktor=12):
+    # Year (counted from the start) in which each loan is repaid, nan when it
+    # is still open after max_years. The balance only falls while the rate
+    # covers the interest, so the first year end at or below 0 is the year of
+    # the payoff month. Year end balance, Sondertilgung included:
+    #   B_12y = q**12y * N - P * (q**12y - 1) / (q - 1) - S * (q**12y - 1) / (q**12 - 1)
+    N, P, r, S = (np.asarray(v, dtype=float)[..., None]
+                  for v in np.broadcast_arrays(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung))
+    years = np.arange(1, max_years + 1)
+    q = 1 + r / Faktor
+    growth = q ** (12 * years)
+    flat = q == 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly = np.where(flat, 12 * years, (growth - 1) / (q - 1))
+        yearly = np.where(flat, years, (growth - 1) / (q ** 12 - 1))
+    balance = growth * N - P * monthly - S * yearly
+    repaid = balance <= 0
+    return np.where(repaid.any(axis=-1), repaid.argmax(axis=-1) + 1.0, np.nan)
+
+
+def sensitivity_grid(
+    kaufpreis,
+    Eigenkapital,
+    Sollzins_values,
+    Tilgungsrate_values,
+    Sollzinsbindung,
+    Sondertilgung_rate=0.05,
+    Grunderwerbsteuer_rate=0.06,
+    Maklerprovison_rate=0.0357,
+    Notarkosten_rate=0.015,
+    Grundbucheintrag_rate=0.005,
+):
+    # Metrics as (Sollzins x Tilgungsrate) arrays, or (Sondertilgung rate x
+    # Sollzins x Tilgungsrate) when Sondertilgung_rate is a sequence:
+    # total_interest and residual_debt over the Sollzinsbindung as on the
+    # schedule, and payoff_year.
+    Sollzins_values = np.asarray(Sollzins_values, dtype=float)
+    Tilgungsrate_values = np.asarray(Tilgungsrate_values, dtype=float)
+    Sondertilgung_rates = np.atleast_1d(np.asarray(Sondertilgung_rate, dtype=float))
+    Sondertilgung, Sollzins, Tilgungsrate = (
+        axis.ravel() for axis in np.meshgrid(Sondertilgung_rates, Sollzins_values, Tilgungsrate_values, indexing='ij')
+    )
+
+    result = generate_batch(
+        kaufpreis=kaufpreis,
+        Eigenkapital=Eigenkapital,
+        Tilgungsrate=Tilgungsrate,
+        Sollzins=Sollzins,
+        Sollzinsbindung=Sollzinsbindung,
+        Sondertilgung_rate=Sondertilgung,
+        Grunderwerbsteuer_rate=Grunderwerbsteuer_rate,
+        Maklerprovison_rate=Maklerprovison_rate,
+        Notarkosten_rate=Notarkosten_rate,
+        Grundbucheintrag_rate=Grundbucheintrag_rate,
+    )
+    summary = summaries(result)
+    payoff = payoff_years(result['Nettodarlehen'], result['Fest_Monatsrate'], Sollzins, result['Sondertilgung'])
+
+    shape = (len(Sondertilgung_rates), len(Sollzins_values), len(Tilgungsrate_values))
+    metrics = {
+        'total_interest': summary['total_interest'],
+        'residual_debt': summary['residual_debt'],
+        'payoff_year': payoff,
+    }
+    if np.ndim(Sondertilgung_rate) == 0:
+        shape = shape[1:]
+    return {
+        'Sollzins': Sollzins_values,
+        'Tilgungsrate': Tilgungsrate_values,
+        'Sondertilgung_rate': Sondertilgung_rates if np.ndim(Sondertilgung_rate) else float(Sondertilgung_rate),
+        **{name: values.reshape(shape) for name, values in metrics.items()},
+    }
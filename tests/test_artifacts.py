@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from artifact_sink import sink_from_setting
+from dash_utilities import generate_graph_df
+from schedule_storage import open_table
+
+pytest.importorskip('pyarrow')
+
+
+# Schedules handed to the background sink come back from the file as written,
+# the start row's Date (0 in the DataFrame) as null.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+
+
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+def test_written_schedule_reads_back(tmp_path, fmt):
+    df = generate_graph_df(**LOAN)
+    sink = sink_from_setting(str(tmp_path), fmt)
+    sink.submit('with_repayment', df)
+    sink.close()
+    assert sink.failed == 0
+    files = list(tmp_path.glob(f'with_repayment-*.{fmt}'))
+    assert len(files) == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+    stored = open_table(files[0]).to_pandas()
+    assert stored['Date'].iloc[0] is None
+    expected = df.copy()
+    expected['Date'] = [None] + df['Date'].iloc[1:].tolist()
+    pd.testing.assert_frame_equal(stored, expected)
+
+
+def test_csv_keeps_start_row(tmp_path):
+    df = generate_graph_df(**LOAN)
+    sink = sink_from_setting(str(tmp_path), 'csv')
+    sink.submit('with_repayment', df)
+    sink.close()
+    stored = pd.read_csv(next(tmp_path.glob('with_repayment-*.csv')))
+    assert len(stored) == len(df)
+    assert stored['Date'].iloc[0] == '0'
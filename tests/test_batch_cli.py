@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from batch_cli import REPORTED_ERRORS, main, run
+
+pytest.importorskip('pyarrow')
+
+
+# Invalid rows are counted, only the first few are kept with their message.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+
+
+def portfolio(tmp_path, valid, invalid):
+    rows = [LOAN] * valid + [{**LOAN, 'Sollzins': -0.01}] * invalid
+    path = tmp_path / 'loans.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_invalid_rows_are_counted(tmp_path):
+    path = portfolio(tmp_path, 5, 300)
+    loans, invalid, examples, written = run(path, str(tmp_path / 'out.parquet'), workers=1, chunk_rows=64)
+    assert (loans, invalid, written) == (305, 300, True)
+    assert [row for row, _ in examples] == list(range(5, 5 + REPORTED_ERRORS))
+    assert len(pd.read_parquet(tmp_path / 'out.parquet')) == 305
+
+
+def test_schedule_without_valid_loan_writes_nothing(tmp_path, capsys):
+    path = portfolio(tmp_path, 0, 3)
+    output = tmp_path / 'out.arrow'
+    assert main([path, '-o', str(output), '--detail', 'schedule', '--workers', '1', '--quiet']) == 1
+    assert not output.exists()
+    assert 'nothing written' in capsys.readouterr().err
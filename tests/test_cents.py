@@ -0,0 +1,62 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from dash_utilities import RATE_SCALE, generate_batch
+
+
+# generate_batch(arithmetic='cents') against a plain Decimal booking of the
+# same loans: interest rounded half up to the cent every month, the last
+# rate and the Sondertilgung capped at what is still owed.
+
+
+def decimal_schedule(Nettodarlehen, Fest_Monatsrate, Sollzins, Sondertilgung, months):
+    rate = Decimal(int(round(Sollzins * RATE_SCALE))) / RATE_SCALE
+    balance = Decimal(Nettodarlehen)
+    rows = {name: [] for name in ('Zinszahlung', 'Tilgungszahlung', 'Sondertilgunszahlung', 'aktuelle_Nettodarlehen')}
+    for month in range(1, months + 1):
+        interest = principal = sonder = Decimal(0)
+        if balance > 0:
+            interest = (balance * rate / 12).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+            principal = min(Fest_Monatsrate - interest, balance)
+            balance -= principal
+            if month % 12 == 0:
+                sonder = min(Decimal(Sondertilgung), balance)
+                balance -= sonder
+        rows['Zinszahlung'].append(int(interest))
+        rows['Tilgungszahlung'].append(int(principal))
+        rows['Sondertilgunszahlung'].append(int(sonder))
+        rows['aktuelle_Nettodarlehen'].append(int(balance))
+    rows['totaltilgungszahlung'] = [Nettodarlehen - balance for balance in rows['aktuelle_Nettodarlehen']]
+    return rows
+
+
+def test_cents_match_decimal_booking():
+    rng = np.random.default_rng(0)
+    n = 120
+    params = dict(
+        kaufpreis=rng.uniform(1e5, 1.5e6, n).round(2),
+        Eigenkapital=rng.uniform(0, 1e5, n).round(2),
+        Tilgungsrate=rng.uniform(0, 0.2, n).round(4),
+        Sollzins=rng.choice([0, 0.0099, 0.035, 0.04125, 0.0599], n),
+        Sollzinsbindung=rng.integers(1, 31, n),
+        Sondertilgung_rate=rng.choice([0, 0.05, 0.3], n),
+    )
+    result = generate_batch(params, arithmetic='cents')
+    for row in range(n):
+        months = int(result['months'][row])
+        expected = decimal_schedule(
+            int(result['Nettodarlehen'][row]), int(result['Fest_Monatsrate'][row]), params['Sollzins'][row],
+            int(result['Sondertilgung'][row]), months
+        )
+        for name, values in expected.items():
+            assert result[name][row, :months].tolist() == values, (row, name)
+            assert not result[name][row, months:].any()
+
+
+def test_cents_are_integers():
+    result = generate_batch(kaufpreis=500000, Eigenkapital=100000, Tilgungsrate=0.02, Sollzins=0.035,
+                            Sollzinsbindung=10, arithmetic='cents')
+    for name in ('Zinszahlung', 'Tilgungszahlung', 'Sondertilgunszahlung', 'totaltilgungszahlung',
+                 'aktuelle_Nettodarlehen', 'Nettodarlehen', 'Fest_Monatsrate', 'Sondertilgung'):
+        assert result[name].dtype == np.int64
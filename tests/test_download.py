@@ -0,0 +1,47 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from app_dash import canonical_calculation, server
+from result_store import result_key
+
+
+# /download/<key>.<fmt> sends the schedule with the debt in whole euros and
+# no month for the start row.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10,
+            Sondertilgung_rates=[0.05, 0], Grunderwerbsteuer_rate=0.06, Maklerprovison_rate=0.0357,
+            Notarkosten_rate=0.015, Grundbucheintrag_rate=0.005)
+
+
+def download(fmt, language='en', **overrides):
+    params = canonical_calculation({**LOAN, **overrides})
+    response = server.test_client().get(
+        f'/download/{result_key(params)}.{fmt}', query_string={'params': json.dumps(params), 'lang': language}
+    )
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.parametrize('language', ['en', 'de', 'zh'])
+def test_csv_start_row(language):
+    text = download('csv', language).decode('utf-8')
+    header, start, first = text.splitlines()[:3]
+    assert start.split(',')[:3] == ['0', '', '366280']
+    assert first.split(',')[1] in ('Jan 2025', '2025 一月')
+
+
+def test_parquet_matches_csv():
+    pytest.importorskip('pyarrow')
+    parquet = pd.read_parquet(io.BytesIO(download('parquet')))
+    csv = pd.read_csv(io.BytesIO(download('csv')), keep_default_na=False)
+    assert parquet.iloc[:, 2].dtype == 'int64'
+    pd.testing.assert_frame_equal(parquet, csv, check_dtype=False)
+
+
+@pytest.mark.parametrize('Eigenkapital', [446280, 1e6])
+def test_equity_covering_the_purchase_is_rejected(Eigenkapital):
+    with pytest.raises(ValueError, match='Eigenkapital covers the whole purchase'):
+        canonical_calculation({**LOAN, 'Eigenkapital': Eigenkapital})
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dash_utilities import generate_batch, generate_graph_df
+
+
+# The numpy engine serves every request, the loop engine is the original
+# month by month implementation; both must give the same DataFrame, dtypes
+# included.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+
+
+def assert_engines_match(**params):
+    loop = generate_graph_df(**params, engine='loop')
+    numpy = generate_graph_df(**params, engine='numpy')
+    pd.testing.assert_frame_equal(loop, numpy, check_exact=True)
+    return numpy
+
+
+def random_loans(n, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield dict(
+            kaufpreis=round(rng.uniform(1e5, 1.5e6), -3),
+            Eigenkapital=round(rng.uniform(0, 1e5), -3),
+            Tilgungsrate=float(rng.choice([0.01, 0.02, 0.03, 0.05, 0.1])),
+            Sollzins=round(rng.uniform(0, 0.07), 4),
+            Sollzinsbindung=int(rng.integers(1, 31)),
+            Sondertilgung_rate=float(rng.choice([0, 0.05, 0.1])),
+        )
+
+
+@pytest.mark.parametrize('params', list(random_loans(150)))
+def test_random_grid(params):
+    assert_engines_match(**params)
+
+
+def test_without_interest():
+    df = assert_engines_match(**{**LOAN, 'Sollzins': 0.0})
+    assert df['Zinszahlung_List'].sum() == 0
+
+
+def test_without_interest_and_sondertilgung():
+    assert_engines_match(**{**LOAN, 'Sollzins': 0.0, 'Sondertilgung_rate': 0.0, 'Tilgungsrate': 0.2})
+
+
+def test_payoff_before_horizon():
+    df = assert_engines_match(**{**LOAN, 'Tilgungsrate': 0.3})
+    assert df['aktuelle_Nettodarlehen_List'].iloc[-1] == 0
+    assert df['Zinszahlung_List'].iloc[-1] == 0
+
+
+def test_no_sondertilgung():
+    assert_engines_match(**{**LOAN, 'Sondertilgung_rate': 0.0})
+
+
+def test_zero_sollzinsbindung():
+    df = assert_engines_match(**{**LOAN, 'Sollzinsbindung': 0})
+    assert len(df) == 1
+
+
+def test_batch_matches_single_loans():
+    loans = list(random_loans(40, seed=1))
+    result = generate_batch(pd.DataFrame(loans))
+    for row, params in enumerate(loans):
+        df = generate_graph_df(**params)
+        months = params['Sollzinsbindung'] * 12
+        for name in ('Zinszahlung', 'Tilgungszahlung', 'totaltilgungszahlung', 'aktuelle_Nettodarlehen'):
+            np.testing.assert_array_equal(result[name][row, :months], df[f'{name}_List'].to_numpy()[1:])
@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+from dash_utilities import _loan_terms
+from goal_seek import MAX_YEARS, RATE_STEP, goal_seek, payoff_months
+from scenario_api import MAX_AMOUNT, MAX_RATE
+
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sondertilgung_rate=0.0)
+FEES = dict(Grunderwerbsteuer_rate=0.06, Maklerprovison_rate=0.0357, Notarkosten_rate=0.015,
+            Grundbucheintrag_rate=0.005)
+
+
+def payoff(Tilgungsrate):
+    Nettodarlehen, Sondertilgung, Fest_Monatsrate = _loan_terms(**{**LOAN, **FEES, 'Tilgungsrate': Tilgungsrate})
+    return payoff_months(Nettodarlehen, Fest_Monatsrate, LOAN['Sollzins'], Sondertilgung, MAX_YEARS * 12)[0]
+
+
+@pytest.mark.parametrize('years', [10, 25.5, 40])
+def test_payoff_target_is_met(years):
+    result = goal_seek('Tilgungsrate', 'payoff_years', years, **LOAN)
+    assert result['payoff_month'] == payoff(result['value']) <= years * 12
+    # one RATE_STEP less misses it
+    assert payoff(result['value'] - RATE_STEP) > years * 12
+
+
+def test_budget_is_met():
+    result = goal_seek('kaufpreis', 'budget', 2000, **LOAN)
+    assert result['Fest_Monatsrate'] <= 2000
+    above = goal_seek('kaufpreis', 'budget', 2001, **LOAN)
+    assert above['value'] > result['value']
+
+
+@pytest.mark.parametrize('target, value', [
+    ('payoff_years', MAX_YEARS + 1), ('payoff_years', 1e12), ('payoff_years', 0), ('budget', -5),
+    ('budget', math.inf), ('payoff_years', math.nan),
+])
+def test_goal_values_out_of_range(target, value):
+    with pytest.raises(ValueError):
+        goal_seek('Tilgungsrate', target, value, **LOAN)
+
+
+def test_solutions_stay_within_limits():
+    assert goal_seek('kaufpreis', 'budget', 1e9, **LOAN)['value'] == MAX_AMOUNT
+    assert goal_seek('Tilgungsrate', 'budget', 1e9, **LOAN)['value'] == MAX_RATE
+    assert goal_seek('Tilgungsrate', 'payoff_years', 0.1, **LOAN)['value'] is None
+
+
+FORM = dict(n_clicks=1, purchase_price=400000, equity=80000, broker_fee=3.57, notary_fee=1.5,
+            real_estate_transfer_tax=6, land_registry=0.5, extra_payment_rate=5, repayment_rate=2, interest_rate=3.5,
+            goal_variable='repayment-rate', goal_target='payoff_years', goal_value=25)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('purchase_price', None), ('interest_rate', None), ('purchase_price', 1e12), ('interest_rate', 500),
+    ('goal_value', 1e9), ('goal_variable', 'equity'),
+])
+def test_solve_goal_rejects_invalid_form(name, value):
+    from app_dash import solve_goal
+
+    assert solve_goal(**{**FORM, name: value})[-1] == {'status': 'invalid'}
+
+
+def test_solve_goal():
+    from app_dash import solve_goal
+
+    assert solve_goal(**FORM)[-1]['status'] == 'solved'
@@ -0,0 +1,46 @@
+import pytest
+
+from refinancing import simulate_refinancing
+
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+
+
+@pytest.mark.parametrize('Eigenkapital', [450000, 1e6])
+def test_no_loan_to_refinance(Eigenkapital):
+    with pytest.raises(ValueError):
+        simulate_refinancing(**{**LOAN, 'Eigenkapital': Eigenkapital}, paths=100, workers=1)
+
+
+def test_repaid_within_sollzinsbindung():
+    result = simulate_refinancing(**{**LOAN, 'Tilgungsrate': 0.3}, paths=100, seed=0, workers=1)
+    assert result['residual'] == 0
+    assert result['not_repaid'] == 0
+    assert len(set(result['payoff_date'])) == 1
+
+
+def test_seeded_runs_repeat():
+    first = simulate_refinancing(**LOAN, paths=500, seed=1, workers=1)
+    second = simulate_refinancing(**LOAN, paths=500, seed=1, workers=1)
+    assert first['payoff_date'] == second['payoff_date']
+    assert (first['total_interest'] == second['total_interest']).all()
+
+
+# simulate_followup checks the form like a calculation before taking a job slot
+
+FORM = dict(n_clicks=1, purchase_price=400000, equity=80000, broker_fee=3.57, notary_fee=1.5,
+            real_estate_transfer_tax=6, land_registry=0.5, extra_payment_rate=5, repayment_rate=2, interest_rate=3.5,
+            fixed_interest=10, long_term_rate=3.5, rate_volatility=1, paths=200)
+
+
+@pytest.mark.parametrize('name, value', [
+    ('fixed_interest', 500), ('fixed_interest', None), ('purchase_price', None), ('equity', -1), ('equity', 1e6),
+    ('interest_rate', float('inf')), ('rate_volatility', 1e6), ('long_term_rate', None), ('paths', None),
+])
+def test_followup_rejects_invalid_form(name, value):
+    from app_dash import simulate_followup
+
+    def set_progress(value):
+        raise AssertionError('an invalid form must not start a simulation')
+
+    assert simulate_followup(set_progress, **{**FORM, name: value}) == {'status': 'invalid'}
@@ -0,0 +1,94 @@
+import os
+import stat
+
+import numpy as np
+import pytest
+
+import result_store
+from app_dash import calculate_result, canonical_calculation
+from result_store import ArrowResultStore, DiskResultStore, MemoryResultStore, result_key
+
+
+# Calculation results keep a datetime64[M] month axis and come back from
+# either disk format with the same layout. Results are only computed and
+# stored for parameters that hash to their key.
+
+LOAN = dict(kaufpreis=500000, Eigenkapital=100000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10,
+            Start_Date='2024-12-15')
+TRANCHE = dict(name='KfW', Nettodarlehen=100000, Sollzins=0.02, Tilgungsrate=0.02, Sollzinsbindung=10)
+
+
+@pytest.mark.parametrize('tranches', [None, [TRANCHE]])
+def test_month_axis(tranches):
+    result = calculate_result(canonical_calculation({**LOAN, 'tranches': tranches}))
+    months = result['months']
+    assert months.dtype == np.dtype('datetime64[M]')
+    assert months[0] == np.datetime64('2024-12') and months[-1] == np.datetime64('2034-12')
+    assert len(months) == len(result['years'])
+
+
+@pytest.mark.parametrize('store', [DiskResultStore, ArrowResultStore])
+def test_disk_round_trip(tmp_path, store):
+    if store is ArrowResultStore:
+        pytest.importorskip('pyarrow')
+    result = calculate_result(canonical_calculation({**LOAN, 'tranches': [TRANCHE]}))
+    store(str(tmp_path)).put('a' * 32, result)
+    stored = store(str(tmp_path)).get('a' * 32)
+    np.testing.assert_array_equal(stored['months'], result['months'])
+    assert stored['months'].dtype == result['months'].dtype
+    for part in ('scenarios', 'tranches'):
+        for name, metrics in result[part].items():
+            for metric, values in metrics.items():
+                np.testing.assert_array_equal(stored[part][name][metric], values)
+
+
+def test_mismatched_key_is_neither_computed_nor_stored(monkeypatch):
+    import app_dash
+
+    def calculate_result(params):
+        raise AssertionError('parameters that do not hash to the key must not be computed')
+
+    store = MemoryResultStore()
+    monkeypatch.setattr(app_dash, 'result_store', store)
+    monkeypatch.setattr(app_dash, 'calculate_result', calculate_result)
+    params = canonical_calculation(LOAN)
+    forged = result_key({**params, 'kaufpreis': 1.0})
+    for key in (forged, '0' * 32, 'not a key'):
+        assert app_dash.load_result({'key': key, 'params': params}) is None
+    assert store.stats()['size'] == 0
+
+
+def test_matching_key_is_computed_once(monkeypatch):
+    import app_dash
+
+    store = MemoryResultStore()
+    monkeypatch.setattr(app_dash, 'result_store', store)
+    params = canonical_calculation(LOAN)
+    result = app_dash.load_result({'key': result_key(params), 'params': params})
+    assert store.get(result_key(params)) is result
+
+
+def test_disk_store_keeps_at_most_max_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, 'SWEEP_EVERY', 4)
+    store = DiskResultStore(str(tmp_path), max_files=5)
+    keys = [f'{i:032x}' for i in range(12)]
+    for i, key in enumerate(keys):
+        store.put(key, {'n': i})
+        os.utime(store._path(key), (i, i))
+    # left behind by an older release and a crashed worker
+    (tmp_path / f'{"f" * 32}.pkl').write_bytes(b'')
+    (tmp_path / 'old.tmp').write_bytes(b'')
+    os.utime(tmp_path / 'old.tmp', (0, 0))
+    store.sweep()
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(store._path(key)) for key in keys[-5:])
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX permissions')
+def test_disk_store_needs_a_private_directory(tmp_path):
+    DiskResultStore(str(tmp_path / 'new'))
+    assert stat.S_IMODE(os.stat(tmp_path / 'new').st_mode) & 0o077 == 0
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        DiskResultStore(str(shared))
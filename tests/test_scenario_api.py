@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+
+from dash_utilities import generate_graph_df
+from scenario_api import MAX_AMOUNT, MAX_RATE, MAX_SOLLZINSBINDUNG, RATES, ndjson_blocks, scenario_lines, validate
+
+
+# One NDJSON line per scenario in input order: a result for valid scenarios,
+# {"index": ..., "error": ...} with the first problem for the others.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+
+
+def lines(records, size=1024, **options):
+    blocks = [records[start:start + size] for start in range(0, len(records), size)]
+    return [json.loads(line) for text in scenario_lines(blocks, **options) for line in text.splitlines()]
+
+
+def error(record):
+    return validate([record])[1][0]
+
+
+def test_valid_scenario_matches_the_engine():
+    line, = lines([LOAN], detail='schedule')
+    df = generate_graph_df(**LOAN)
+    assert line['index'] == 0 and 'error' not in line
+    assert line['schedule']['Zinszahlung'] == df['Zinszahlung_List'].tolist()[1:]
+    assert line['total_interest'] == df['Zinszahlung_List'].sum()
+
+
+@pytest.mark.parametrize('record, message', [
+    ([1, 2], 'expected a JSON object per scenario'),
+    ({**LOAN, 'Zinssatz': 0.03}, 'unknown parameter Zinssatz'),
+    ({name: value for name, value in LOAN.items() if name != 'Sollzins'}, 'missing parameter Sollzins'),
+    ({**LOAN, 'Sollzins': 'high'}, 'Sollzins must be a number'),
+    # NaN is how the frame marks missing values
+    ({**LOAN, 'Sollzins': float('nan')}, 'missing parameter Sollzins'),
+    ({**LOAN, 'kaufpreis': 0}, 'kaufpreis must be positive'),
+    ({**LOAN, 'Tilgungsrate': -0.01}, 'Tilgungsrate must not be negative'),
+    ({**LOAN, 'Sollzinsbindung': 0}, 'Sollzinsbindung must be a whole number of years from 1 to 50'),
+    ({**LOAN, 'Sollzinsbindung': 10.5}, 'Sollzinsbindung must be a whole number of years from 1 to 50'),
+    ({**LOAN, 'Eigenkapital': 500000}, 'Eigenkapital covers the whole purchase'),
+])
+def test_error_messages(record, message):
+    assert error(record) == message
+
+
+def test_amount_limits():
+    assert error({**LOAN, 'kaufpreis': MAX_AMOUNT, 'Eigenkapital': MAX_AMOUNT}) is None
+    above = np.nextafter(MAX_AMOUNT, np.inf)
+    assert error({**LOAN, 'kaufpreis': above}) == 'kaufpreis must not exceed 100,000,000'
+    assert error({**LOAN, 'kaufpreis': MAX_AMOUNT, 'Eigenkapital': above}) == 'Eigenkapital must not exceed 100,000,000'
+
+
+@pytest.mark.parametrize('name', RATES)
+def test_rate_limit(name):
+    assert error({**LOAN, name: MAX_RATE}) is None
+    assert error({**LOAN, name: MAX_RATE + 1e-9}) == f'{name} must not exceed 1'
+
+
+def test_sollzinsbindung_limit():
+    assert error({**LOAN, 'Sollzinsbindung': MAX_SOLLZINSBINDUNG}) is None
+    assert error({**LOAN, 'Sollzinsbindung': MAX_SOLLZINSBINDUNG + 1}) is not None
+
+
+def test_first_error_wins():
+    assert error({**LOAN, 'kaufpreis': -1, 'Sollzins': -1}) == 'kaufpreis must be positive'
+
+
+def test_error_lines_keep_input_order_across_blocks():
+    records = [LOAN, None, {**LOAN, 'Sollzins': 2}, LOAN, {}, LOAN, LOAN]
+    result = lines(records, size=2)
+    assert [line['index'] for line in result] == list(range(len(records)))
+    assert [line.get('error') for line in result] == [
+        None, 'expected a JSON object per scenario', 'Sollzins must not exceed 1', None,
+        'missing parameter kaufpreis', None, None,
+    ]
+    valid = [line for line in result if 'error' not in line]
+    assert all(line == {**valid[0], 'index': line['index']} for line in valid)
+
+
+def test_unparseable_ndjson_lines_get_an_error_line():
+    text = [json.dumps(LOAN), '', '{not json', json.dumps(LOAN)]
+    result = [json.loads(line) for block in scenario_lines(ndjson_blocks(text, size=2))
+              for line in block.splitlines()]
+    assert [line['index'] for line in result] == [0, 1, 2]
+    assert result[1]['error'] == 'expected a JSON object per scenario'
+
+
+@pytest.mark.parametrize('arithmetic', ['float', 'cents'])
+def test_limits_hold_in_both_arithmetics(arithmetic):
+    extreme = {**LOAN, 'kaufpreis': MAX_AMOUNT, 'Sollzins': MAX_RATE, 'Tilgungsrate': MAX_RATE,
+               'Sollzinsbindung': MAX_SOLLZINSBINDUNG}
+    line, = lines([extreme], arithmetic=arithmetic)
+    assert 'error' not in line
+    assert line['total_interest'] >= 0 and line['residual_debt'] >= 0
+
+
+@pytest.mark.parametrize('name, value', [
+    ('kaufpreis', np.nextafter(MAX_AMOUNT, np.inf)), ('Sollzins', MAX_RATE + 1e-9), ('Tilgungsrate', 5.0),
+    ('Grunderwerbsteuer_rate', 2.0), ('Sollzinsbindung', MAX_SOLLZINSBINDUNG + 1),
+])
+def test_app_calculations_share_the_limits(name, value):
+    from app_dash import canonical_calculation
+
+    canonical_calculation(LOAN)
+    assert error({**LOAN, name: value}) is not None
+    with pytest.raises(ValueError):
+        canonical_calculation({**LOAN, name: value})
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from app_dash import filter_rows, split_filter_part
+from dash_utilities import format_euro
+
+
+# The schedule table formats and filters whole columns at once.
+
+
+@pytest.mark.parametrize('values', [
+    [0, 1, -1, 999, 1000, -1000, 999999.99, 1e6, 12345678.9, 0.01, -0.01],
+    np.random.default_rng(0).integers(-10 ** 11, 10 ** 11, 500) / 100,
+    np.random.default_rng(1).integers(0, 10 ** 6, 500),
+])
+def test_format_euro_matches_fstring(values):
+    assert format_euro(values).tolist() == [f'€{value:,.2f}' for value in np.asarray(values, dtype=float)]
+
+
+def test_format_euro_empty_and_int_columns():
+    assert format_euro(np.array([], dtype=float)).tolist() == []
+    assert format_euro(np.array([366280, 0], dtype=np.int64)).tolist() == ['€366,280.00', '€0.00']
+
+
+COLUMNS = {
+    'year': np.array([0, 0, 1, 1, 2]),
+    'remaining_debt': np.array([300000.0, 250000.0, 200000.0, 150500.5, 0.0]),
+    'monthly_interest': np.array([900, 800, 700, 600, 0]),
+}
+
+
+@pytest.mark.parametrize('query, rows', [
+    (None, [0, 1, 2, 3, 4]),
+    ('', [0, 1, 2, 3, 4]),
+    ('{remaining_debt} ge 200000', [0, 1, 2]),
+    ('{remaining_debt} gt 200000', [0, 1]),
+    ('{remaining_debt} le 150500.5', [3, 4]),
+    ('{remaining_debt} lt "€150,500.50"', [4]),
+    ('{monthly_interest} eq 700', [2]),
+    ('{monthly_interest} ne 0 && {year} eq 1', [2, 3]),
+    ('{year} contains 2', [4]),
+    ('{remaining_debt} contains 150,5', [3]),
+    # unknown columns and values that are not numbers filter nothing
+    ('{missing} gt 1', [0, 1, 2, 3, 4]),
+    ('{remaining_debt} gt lots', [0, 1, 2, 3, 4]),
+])
+def test_filter_rows(query, rows):
+    assert filter_rows(COLUMNS, query).tolist() == rows
+
+
+def test_split_filter_part():
+    assert split_filter_part('{remaining_debt} >= 100000') == ('remaining_debt', '>=', '100000')
+    assert split_filter_part("{year} contains '3'") == ('year', 'contains', '3')
+    assert split_filter_part('no operator') == (None, None, None)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app_dash import calculate_result, canonical_calculation
+from tranches import canonical_tranches, generate_tranches
+
+
+# A financing of several tranches, amortized together and shifted onto the
+# calendar after their repayment-free years.
+
+LOAN = dict(kaufpreis=400000, Eigenkapital=80000, Tilgungsrate=0.02, Sollzins=0.035, Sollzinsbindung=10)
+KFW = dict(name='KfW', Nettodarlehen=100000, Sollzins=0.02, Tilgungsrate=0.02, Sollzinsbindung=10)
+
+
+@pytest.mark.parametrize('Sollzinsbindung', [5, 10, 30])
+def test_zero_amount_tranche_reproduces_the_single_loan(Sollzinsbindung):
+    single = calculate_result(canonical_calculation({**LOAN, 'Sollzinsbindung': Sollzinsbindung}))
+    empty = {**KFW, 'Nettodarlehen': 0, 'Sollzinsbindung': Sollzinsbindung}
+    tranched = calculate_result(canonical_calculation({**LOAN, 'Sollzinsbindung': Sollzinsbindung,
+                                                       'tranches': [empty]}))
+    np.testing.assert_array_equal(tranched['months'], single['months'])
+    np.testing.assert_array_equal(tranched['years'], single['years'])
+    for scenario, metrics in single['scenarios'].items():
+        for metric, values in metrics.items():
+            assert tranched['scenarios'][scenario][metric].dtype == values.dtype, (scenario, metric)
+            np.testing.assert_array_equal(tranched['scenarios'][scenario][metric], values, err_msg=metric)
+
+
+def test_scenarios_are_the_sum_of_the_tranches():
+    result = calculate_result(canonical_calculation({**LOAN, 'tranches': [KFW]}))
+    assert list(result['tranches']) == ['bank_loan', 'KfW']
+    for metric, values in result['scenarios']['with_extra_repayment'].items():
+        total = sum(tranche[metric] for tranche in result['tranches'].values())
+        np.testing.assert_allclose(values, total, err_msg=metric)
+
+
+def test_repayment_free_years():
+    schedule = generate_tranches([{**KFW, 'Tilgungsfreie_Jahre': 2, 'Sondertilgung_rate': 0.05}])
+    free = slice(1, 2 * 12 + 1)
+    assert not schedule['Tilgungszahlung_List'][0, free].any()
+    assert not schedule['Sondertilgunszahlung_List'][0, free].any()
+    assert (schedule['aktuelle_Nettodarlehen_List'][0, free] == KFW['Nettodarlehen']).all()
+    assert (schedule['Zinszahlung_List'][0, free] == round(KFW['Nettodarlehen'] * KFW['Sollzins'] / 12)).all()
+    assert schedule['Tilgungszahlung_List'][0, 2 * 12 + 1] > 0
+
+
+def test_residual_debt_stays_after_a_shorter_sollzinsbindung():
+    schedule = generate_tranches([KFW, {**KFW, 'name': 'Bauspar', 'Sollzinsbindung': 5}])
+    residual = schedule['aktuelle_Nettodarlehen_List'][1, 5 * 12]
+    assert residual > 0
+    assert (schedule['aktuelle_Nettodarlehen_List'][1, 5 * 12:] == residual).all()
+    assert not schedule['Zinszahlung_List'][1, 5 * 12 + 1:].any()
+    np.testing.assert_array_equal(schedule['combined']['aktuelle_Nettodarlehen_List'],
+                                  schedule['aktuelle_Nettodarlehen_List'].sum(axis=0))
+
+
+@pytest.mark.parametrize('tranche, message', [
+    ({**KFW, 'Nettodarlehen': 2e8}, 'Nettodarlehen must not exceed'),
+    ({**KFW, 'Sollzins': 1.5}, 'Sollzins must not exceed'),
+    ({**KFW, 'Sollzinsbindung': 51}, 'Sollzinsbindung must be from 1 to 50 years'),
+    ({**KFW, 'Sollzinsbindung': 2.5}, 'Sollzinsbindung must be whole years'),
+    ({**KFW, 'Tilgungsfreie_Jahre': 11}, 'Tilgungsfreie_Jahre must not exceed the Sollzinsbindung'),
+    ({**KFW, 'Tilgungsrate': -0.01}, 'Tilgungsrate must be a number >= 0'),
+    ({**KFW, 'Zins': 0.01}, 'unknown tranche parameters: Zins'),
+    ({key: value for key, value in KFW.items() if key != 'Sollzins'}, 'missing parameter Sollzins'),
+])
+def test_invalid_tranches(tranche, message):
+    with pytest.raises(ValueError, match=message):
+        canonical_tranches([tranche])
+
+
+def test_tranche_names_are_unique():
+    names = [tranche['name'] for tranche in canonical_tranches([KFW, KFW, {**KFW, 'name': ''}])]
+    assert names == ['KfW', "KfW'", '#3']
@@ -0,0 +1,152 @@
+import numpy as np
+
+from dash_utilities import _amortize, month_axis
+from scenario_api import MAX_AMOUNT, MAX_RATE, MAX_SOLLZINSBINDUNG
+from schedule_cache import FLOAT_DECIMALS
+
+
+# Financing made of several tranches (bank loan, KfW, Bausparvertrag, ...),
+# each with its own amount, Sollzins, Tilgungsrate, Sollzinsbindung and an
+# optional repayment-free start (Tilgungsfreie_Jahre, interest only). All
+# tranches are amortized in one vectorized _amortize call on their own time
+# axis, which starts after the repayment-free years, and then shifted onto
+# the calendar. Sondertilgung is booked every 12th month of that axis.
+#
+# The combined schedule runs until the longest Sollzinsbindung ends. A
+# tranche whose Sollzinsbindung is over has no payments after it, but its
+# residual debt is still owed and stays in the combined remaining debt.
+
+TRANCHE_PARAMETERS = {
+    'Nettodarlehen': None,
+    'Sollzins': None,
+    'Tilgungsrate': None,
+    'Sollzinsbindung': None,
+    'Tilgungsfreie_Jahre': 0,
+    'Sondertilgung_rate': 0.0,
+}
+
+# upper limits as in scenario_api, the years are checked against the
+# Sollzinsbindung
+TRANCHE_LIMITS = {
+    'Nettodarlehen': MAX_AMOUNT,
+    'Sollzins': MAX_RATE,
+    'Tilgungsrate': MAX_RATE,
+    'Sondertilgung_rate': MAX_RATE,
+}
+
+# per tranche and month, laid out like generate_variants with a start row
+TRANCHE_ARRAYS = (
+    'Zinszahlung',
+    'Tilgungszahlung',
+    'Sondertilgunszahlung',
+    'totaltilgungszahlung',
+    'aktuelle_Nettodarlehen',
+)
+
+
+def canonical_tranches(tranches, normalize=True):
+    # list of tranche dicts with every parameter filled in, numbers
+    # normalized (unless normalize is false) and unique names; raises
+    # ValueError for invalid tranches
+    canonical = []
+    names = set()
+    for i, tranche in enumerate(tranches):
+        unknown = set(tranche) - set(TRANCHE_PARAMETERS) - {'name'}
+        if unknown:
+            raise ValueError(f"unknown tranche parameters: {', '.join(sorted(unknown))}")
+        name = str(tranche.get('name') or f'#{i + 1}')
+        while name in names:
+            name += "'"
+        names.add(name)
+        entry = {'name': name}
+        for parameter, default in TRANCHE_PARAMETERS.items():
+            value = tranche.get(parameter, default)
+            if value is None:
+                raise ValueError(f'tranche {name}: missing parameter {parameter}')
+            value = float(value)
+            if not np.isfinite(value) or value < 0:
+                raise ValueError(f'tranche {name}: {parameter} must be a number >= 0')
+            if value > TRANCHE_LIMITS.get(parameter, np.inf):
+                raise ValueError(f'tranche {name}: {parameter} must not exceed {TRANCHE_LIMITS[parameter]:g}')
+            if parameter in ('Sollzinsbindung', 'Tilgungsfreie_Jahre'):
+                if value % 1:
+                    raise ValueError(f'tranche {name}: {parameter} must be whole years')
+                value = int(value)
+            elif normalize:
+                value = round(value, FLOAT_DECIMALS) + 0.0
+            entry[parameter] = value
+        if not 1 <= entry['Sollzinsbindung'] <= MAX_SOLLZINSBINDUNG:
+            raise ValueError(f'tranche {name}: Sollzinsbindung must be from 1 to {MAX_SOLLZINSBINDUNG} years')
+        if entry['Tilgungsfreie_Jahre'] > entry['Sollzinsbindung']:
+            raise ValueError(f'tranche {name}: Tilgungsfreie_Jahre must not exceed the Sollzinsbindung')
+        canonical.append(entry)
+    return canonical
+
+
+def generate_tranches(tranches, Start_Date='2024-12-01', Faktor=12):
+    # Monthly schedule of every tranche and their sum. Tranche arrays are
+    # (tranche x month) with the start row, 'combined' holds the column sums.
+    # Fest_Monatsrate is the rate once the repayment-free years are over.
+    # Amounts are used as given, the rounding of canonical_tranches is only
+    # there to give equal inputs equal keys.
+    tranches = canonical_tranches(tranches, normalize=False)
+    column = {name: np.array([tranche[name] for tranche in tranches], dtype=float) for name in TRANCHE_PARAMETERS}
+    Nettodarlehen = column['Nettodarlehen']
+    Sollzins = column['Sollzins']
+    free = column['Tilgungsfreie_Jahre'].astype(np.int64) * 12
+    horizon = column['Sollzinsbindung'].astype(np.int64) * 12
+    months = int(horizon.max()) if len(tranches) else 0
+
+    Fest_Monatsrate = np.rint((column['Tilgungsrate'] + Sollzins) * Nettodarlehen / Faktor)
+    amortized = np.maximum(horizon - free, 0)
+    arrays = _amortize(
+        Nettodarlehen, Fest_Monatsrate, Sollzins, Nettodarlehen * column['Sondertilgung_rate'], amortized,
+        Faktor, total_months=max(int(amortized.max()) if len(tranches) else 0, 1)
+    )
+
+    # calendar month k is month k - free of a tranche's own axis
+    k = np.arange(1, months + 1)
+    index = k - free[:, None] - 1
+    repaying = (index >= 0) & (k <= horizon[:, None])
+    interest_only = (index < 0) & (k <= horizon[:, None])
+    position = np.clip(index, 0, arrays['Zinszahlung'].shape[1] - 1)
+
+    def shifted(values):
+        return np.where(repaying, np.take_along_axis(values, position, axis=1), 0).astype(values.dtype)
+
+    # owed at the end of the Sollzinsbindung, carried on until the combined end
+    last = np.clip(amortized - 1, 0, None)
+    final = np.where(amortized > 0, arrays['aktuelle_Nettodarlehen'][np.arange(len(tranches)), last], Nettodarlehen)
+    balance = np.where(repaying, np.take_along_axis(arrays['aktuelle_Nettodarlehen'], position, axis=1), final[:, None])
+    balance = np.where(interest_only, Nettodarlehen[:, None], balance)
+    # repaid principal as the engine books it, kept after the Sollzinsbindung
+    rows = np.arange(len(tranches))
+    paid = np.where(amortized > 0, arrays['totaltilgungszahlung'][rows, last], 0)
+    paid = np.where(repaying, np.take_along_axis(arrays['totaltilgungszahlung'], position, axis=1), paid[:, None])
+    paid = np.where(interest_only, 0, paid)
+
+    monthly = {
+        'Zinszahlung': shifted(arrays['Zinszahlung'])
+        + np.where(interest_only, np.rint(Nettodarlehen * Sollzins / Faktor)[:, None], 0).astype(np.int64),
+        'Tilgungszahlung': shifted(arrays['Tilgungszahlung']),
+        'Sondertilgunszahlung': shifted(arrays['Sondertilgunszahlung']),
+        'totaltilgungszahlung': paid,
+        'aktuelle_Nettodarlehen': balance,
+    }
+
+    def with_start(values, start):
+        return np.concatenate((np.broadcast_to(start, (len(tranches), 1)).astype(values.dtype), values), axis=1)
+
+    result = {
+        'names': [tranche['name'] for tranche in tranches],
+        'months': month_axis(Start_Date, months),
+        'Years_List': np.cumsum(np.concatenate(([0], np.full(months, 0.08333)))),
+        'Nettodarlehen': Nettodarlehen,
+        'Fest_Monatsrate': Fest_Monatsrate,
+        'in_horizon': k <= horizon[:, None],
+    }
+    for name in TRANCHE_ARRAYS:
+        start = Nettodarlehen[:, None] if name == 'aktuelle_Nettodarlehen' else 0
+        result[f'{name}_List'] = with_start(monthly[name], start)
+    result['combined'] = {f'{name}_List': result[f'{name}_List'].sum(axis=0) for name in TRANCHE_ARRAYS}
+    return result